@@ -3,13 +3,16 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from urllib.parse import quote, unquote
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, ORJSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+import asyncio
+import hashlib
+import logging
 import os
-import re
 import sys
-import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import time
 
@@ -23,14 +26,24 @@ from utils.job_store import (
     init_jobs_db,
     reset_stale_inflight_jobs,
     upsert_job,
+    upsert_job_debounced,
+    upsert_jobs_many,
     get_job,
     get_album_aggregate,
     record_completed_download,
     has_completed_download,
 )
+from utils.track_cache import clear_track_cache, get_cached_track, put_cached_track
+from utils.yt_cache import cache_clear as clear_youtube_metadata_cache
 
 ALLOWED_METADATA_PROVIDERS = frozenset({"deezer", "spotify"})
 
+# Staging folder for all downloads (Navidrome copies and browser downloads); created once here
+TEMP_DIR = Path(config.DOWNLOAD_DIR) / "temp"
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+TEMP_DIR_STR = str(TEMP_DIR)
+TEMP_DIR_RESOLVED = TEMP_DIR.resolve()
+
 # Extra download attempts after the first failure (each failure waits before retrying).
 MAX_DOWNLOAD_RETRIES_CAP = 5
 
@@ -66,6 +79,44 @@ def get_metadata_service(provider: str):
     raise HTTPException(status_code=400, detail="Unknown metadata provider")
 
 
+# Per-host limits shared by all download workers
+_youtube_slots = threading.BoundedSemaphore(config.YOUTUBE_MAX_CONCURRENT)
+_catalog_slots = threading.BoundedSemaphore(config.CATALOG_MAX_CONCURRENT)
+
+
+def get_track_details_cached(provider: str, track_id: str) -> Optional[Dict]:
+    """Catalog track details, served from the in-memory track cache when possible."""
+    cached = get_cached_track(provider, track_id)
+    if cached is not None:
+        return cached
+    svc = deezer_service if provider == "deezer" else spotify_service
+    if svc is None:
+        return None
+    with _catalog_slots:
+        track_info = svc.get_track_details(track_id)
+    if track_info:
+        put_cached_track(provider, track_id, track_info)
+    return track_info
+
+
+def prime_album_track_cache(provider: str, album: Dict) -> None:
+    """Seed the track cache from a batch lookup so per-track jobs skip the catalog lookup.
+
+    Only providers with a batch endpoint (Spotify GET /v1/tracks) are primed. Album
+    listings carry album-level artists and running indices rather than the per-track
+    details get_track_details returns, so they must not stand in for them.
+    """
+    svc = deezer_service if provider == "deezer" else spotify_service
+    bulk_lookup = getattr(svc, "get_tracks_bulk", None)
+    track_ids = [t["id"] for t in album.get("tracks") or [] if t.get("id")]
+    if bulk_lookup is None or not track_ids:
+        return
+    with _catalog_slots:
+        full_details = bulk_lookup(track_ids)
+    for track_id, info in full_details.items():
+        put_cached_track(provider, track_id, info)
+
+
 def resolve_navidrome_library_path_optional(raw: Optional[str]) -> str:
     """Return a configured Navidrome music root. Defaults to the first library."""
     if not raw or not str(raw).strip():
@@ -101,10 +152,43 @@ def get_system_downloads_folder():
 from services.youtube import YouTubeService
 from services.metadata import MetadataService
 from services.navidrome import NavidromeService
-from utils.file_handler import get_download_path
+from utils.file_handler import fast_move, get_download_path
 from utils.navidrome_library_sync import start_navidrome_library_sync_background
 
-app = FastAPI(title="Musikat API", version="1.0.0")
+app = FastAPI(title="Musikat API", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Download jobs (yt-dlp + ffmpeg) run here instead of BackgroundTasks, which execute one after another
+app.state.download_executor = ThreadPoolExecutor(
+    max_workers=config.MAX_CONCURRENT_DOWNLOADS,
+    thread_name_prefix="download",
+)
+
+
+@app.on_event("startup")
+def create_directories() -> None:
+    config.ensure_dirs()
+
+
+@app.on_event("startup")
+def configure_logging() -> None:
+    # Service modules log through `logging`; give them a handler when uvicorn hasn't set one
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+@app.on_event("startup")
+def warm_up_youtube() -> None:
+    # Off the request path: the first search otherwise pays yt-dlp's extractor loading
+    threading.Thread(target=youtube_service.warm_up, name="yt-warmup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def shutdown_download_executor() -> None:
+    app.state.download_executor.shutdown(wait=False, cancel_futures=True)
+
+
+@app.on_event("shutdown")
+def close_http_sessions() -> None:
+    metadata_service.close()
 
 init_jobs_db()
 _stale = reset_stale_inflight_jobs()
@@ -148,8 +232,7 @@ def physical_track_file_exists(
         root = get_download_path(track_info, config.DOWNLOAD_DIR, output_format)
         if os.path.isfile(root):
             return True
-        temp_dir = os.path.join(config.DOWNLOAD_DIR, "temp")
-        temp_p = get_download_path(track_info, temp_dir, output_format)
+        temp_p = get_download_path(track_info, TEMP_DIR_STR, output_format)
         return os.path.isfile(temp_p)
     if location == "navidrome":
         root = resolve_navidrome_library_path_optional(navidrome_library_path)
@@ -171,10 +254,7 @@ def get_duplicate_download_reason(
         return "A download is already in progress for this track."
 
     if track_info is None:
-        svc = deezer_service if provider == "deezer" else spotify_service
-        if svc is None:
-            return None
-        track_info = svc.get_track_details(track_id)
+        track_info = get_track_details_cached(provider, track_id)
     if not track_info:
         return None
 
@@ -255,10 +335,16 @@ def download_and_process(
     metadata_provider: str = "deezer",
     max_retries: int = 0,
     navidrome_library_path: Optional[str] = None,
+    track_info: Optional[Dict] = None,
 ):
     """Background task to download and process a track.
 
+    Runs on app.state.download_executor: yt-dlp, tagging and the library move block only
+    this worker thread, and the YouTube slot is released before tagging starts, so one
+    job's tagging overlaps the next job's download.
+
     navidrome_library_path: resolved absolute root when location is navidrome (must be allowlisted).
+    track_info: catalog details when the caller already has them (album downloads); skips the lookup.
     """
     # Use provided format/quality or fall back to config defaults
     output_format = output_format or config.OUTPUT_FORMAT
@@ -275,7 +361,7 @@ def download_and_process(
             )
             return
 
-        upsert_job(
+        upsert_job_debounced(
             track_id,
             status="processing",
             message="Fetching track info...",
@@ -283,7 +369,8 @@ def download_and_process(
             progress=10,
         )
 
-        track_info = svc.get_track_details(track_id)
+        if track_info is None:
+            track_info = get_track_details_cached(metadata_provider, track_id)
         if not track_info:
             upsert_job(track_id,
                        status="error",
@@ -292,30 +379,26 @@ def download_and_process(
                        )
             return
 
-        upsert_job(track_id, status="processing", message="Preparing download location...", stage="preparing",
-                   progress=15)
+        upsert_job_debounced(track_id, status="processing", message="Preparing download location...", stage="preparing",
+                             progress=15)
 
         # Determine download path based on location preference
         if location == "navidrome":
             # Download directly to Navidrome music directory with proper structure (Artist/Album/)
             # First download to temp location, then copy to Navidrome directory
-            temp_dir = os.path.join(config.DOWNLOAD_DIR, "temp")
-            Path(temp_dir).mkdir(parents=True, exist_ok=True)
-            download_path = get_download_path(track_info, temp_dir, output_format)
+            download_path = get_download_path(track_info, TEMP_DIR_STR, output_format)
             print(f"Downloading track {track_id} for Navidrome: {download_path}")
         else:
             # For local downloads: download to temp folder, then serve via browser download
             # This allows each user's browser to save to their own Downloads folder
-            temp_dir = os.path.join(config.DOWNLOAD_DIR, "temp")
-            Path(temp_dir).mkdir(parents=True, exist_ok=True)
-            download_path = get_download_path(track_info, temp_dir, output_format)
+            download_path = get_download_path(track_info, TEMP_DIR_STR, output_format)
             print(f"Downloading track {track_id} for local browser download: {download_path}")
 
-        upsert_job(track_id,
-                   status="processing",
-                   message="Searching YouTube and downloading...",
-                   stage="downloading",
-                   progress=30)
+        upsert_job_debounced(track_id,
+                             status="processing",
+                             message="Searching YouTube and downloading...",
+                             stage="downloading",
+                             progress=30)
 
         extra = _clamp_download_retries(max_retries)
         max_attempts = 1 + extra
@@ -324,7 +407,7 @@ def download_and_process(
         for attempt in range(max_attempts):
             if attempt > 0:
                 delay_sec = min(8, 2 ** (attempt - 1))
-                upsert_job(
+                upsert_job_debounced(
                     track_id,
                     status="processing",
                     message=f"Download failed, retrying in {delay_sec}s (attempt {attempt + 1}/{max_attempts})...",
@@ -332,22 +415,23 @@ def download_and_process(
                     progress=30,
                 )
                 time.sleep(delay_sec)
-                upsert_job(
+                upsert_job_debounced(
                     track_id,
                     status="processing",
                     message="Searching YouTube and downloading...",
                     stage="downloading",
                     progress=30,
                 )
-            download_result = youtube_service.search_and_download(
-                track_info['name'],
-                track_info['artist'],
-                download_path,
-                track_info,
-                video_id,
-                output_format,
-                audio_quality,
-            )
+            with _youtube_slots:
+                download_result = youtube_service.search_and_download(
+                    track_info['name'],
+                    track_info['artist'],
+                    download_path,
+                    track_info,
+                    video_id,
+                    output_format,
+                    audio_quality,
+                )
             if download_result.get("success"):
                 break
             last_err = download_result.get("error", "Unknown error")
@@ -361,11 +445,11 @@ def download_and_process(
             )
             return
 
-        upsert_job(track_id,
-                   status="processing",
-                   message="Applying metadata...",
-                   stage="tagging",
-                   progress=85)
+        upsert_job_debounced(track_id,
+                             status="processing",
+                             message="Applying metadata...",
+                             stage="tagging",
+                             progress=85)
 
         # Apply metadata to downloaded file
         metadata_service.apply_metadata(download_result['file_path'], track_info)
@@ -373,11 +457,11 @@ def download_and_process(
         # Handle completion based on location
         if location == "navidrome":
             # Copy to Navidrome music directory with proper structure (Artist/Album/)
-            upsert_job(track_id,
-                       status="processing",
-                       message="Copying to Navidrome library...",
-                       stage="copying",
-                       progress=90)
+            upsert_job_debounced(track_id,
+                                 status="processing",
+                                 message="Copying to Navidrome library...",
+                                 stage="copying",
+                                 progress=90)
 
             try:
                 # Get target path in Navidrome directory (extension matches chosen format, e.g. .flac)
@@ -385,12 +469,8 @@ def download_and_process(
                     track_info, output_format, navidrome_library_path
                 )
 
-                # Copy file to Navidrome directory
-                shutil.copy2(download_result['file_path'], target_path)
-
-                # Clean up temp file
-                if os.path.exists(download_result['file_path']):
-                    os.remove(download_result['file_path'])
+                # Move file into Navidrome directory (rename when on the same filesystem)
+                fast_move(download_result['file_path'], target_path)
 
                 # Trigger Navidrome scan
                 navidrome_result = navidrome_service.finalize_track(str(target_path))
@@ -476,7 +556,7 @@ async def metadata_providers():
 
 
 @app.post("/api/search", response_model=List[TrackResponse])
-async def search_tracks(request: SearchRequest):
+def search_tracks(request: SearchRequest):
     """Search for tracks using the selected catalog provider."""
     provider = resolve_metadata_provider(request.provider)
     svc = get_metadata_service(provider)
@@ -487,7 +567,7 @@ async def search_tracks(request: SearchRequest):
 
 
 @app.post("/api/reverse/youtube")
-async def reverse_lookup_youtube(request: ReverseLookupRequest):
+def reverse_lookup_youtube(request: ReverseLookupRequest):
     """Given a YouTube URL, extract title and search the selected catalog."""
     provider = resolve_metadata_provider(request.provider)
     svc = get_metadata_service(provider)
@@ -516,7 +596,7 @@ async def reverse_lookup_youtube(request: ReverseLookupRequest):
 
 
 @app.post("/api/search/tracks/top")
-async def search_tracks_top(request: SearchRequest):
+def search_tracks_top(request: SearchRequest):
     """Search tracks with a small default limit (pick-lists)."""
     provider = resolve_metadata_provider(request.provider)
     svc = get_metadata_service(provider)
@@ -529,7 +609,7 @@ async def search_tracks_top(request: SearchRequest):
 
 
 @app.post("/api/search/albums")
-async def search_albums(request: SearchRequest):
+def search_albums(request: SearchRequest):
     """Search for albums."""
     provider = resolve_metadata_provider(request.provider)
     svc = get_metadata_service(provider)
@@ -540,7 +620,7 @@ async def search_albums(request: SearchRequest):
 
 
 @app.get("/api/album/{album_id}")
-async def get_album(album_id: str, provider: Optional[str] = Query(None)):
+def get_album(album_id: str, provider: Optional[str] = Query(None)):
     """Get album details including all tracks"""
     p = resolve_metadata_provider(provider)
     svc = get_metadata_service(p)
@@ -556,12 +636,12 @@ async def get_album(album_id: str, provider: Optional[str] = Query(None)):
 
 
 @app.get("/api/track/{track_id}", response_model=TrackResponse)
-async def get_track(track_id: str, provider: Optional[str] = Query(None)):
+def get_track(track_id: str, provider: Optional[str] = Query(None)):
     """Get details for a specific track"""
     p = resolve_metadata_provider(provider)
-    svc = get_metadata_service(p)
+    get_metadata_service(p)
     try:
-        track = svc.get_track_details(track_id)
+        track = get_track_details_cached(p, track_id)
         if not track:
             raise HTTPException(status_code=404, detail="Track not found")
         return track
@@ -572,7 +652,7 @@ async def get_track(track_id: str, provider: Optional[str] = Query(None)):
 
 
 @app.post("/api/download")
-async def download_track(request: DownloadRequest, background_tasks: BackgroundTasks):
+def download_track(request: DownloadRequest):
     """Start downloading a track"""
     if request.location not in ["local", "navidrome"]:
         request.location = "local"
@@ -604,7 +684,7 @@ async def download_track(request: DownloadRequest, background_tasks: BackgroundT
         stage="queued",
         payload={"provider": provider, "record_track_id": request.track_id},
     )
-    background_tasks.add_task(
+    app.state.download_executor.submit(
         download_and_process,
         request.track_id,
         request.location,
@@ -634,7 +714,7 @@ def reverse_download_and_process(
 ):
     """Background task: download a specific YouTube URL and tag using catalog or manual metadata."""
     try:
-        upsert_job(job_id, status="processing", message="Extracting YouTube info...", stage="fetching", progress=10)
+        upsert_job_debounced(job_id, status="processing", message="Extracting YouTube info...", stage="fetching", progress=10)
 
         yt_info = youtube_service.extract_video_info(youtube_url)
         if not yt_info.get('success'):
@@ -653,9 +733,9 @@ def reverse_download_and_process(
             if svc is None:
                 upsert_job(job_id, status="error", message="Spotify is not configured", progress=0)
                 return
-            upsert_job(job_id, status="processing", message="Fetching track info...", stage="fetching",
-                       progress=20)
-            track_info = svc.get_track_details(track_id)
+            upsert_job_debounced(job_id, status="processing", message="Fetching track info...", stage="fetching",
+                                 progress=20)
+            track_info = get_track_details_cached(metadata_provider, track_id)
             if not track_info:
                 upsert_job(job_id, status="error", message="Could not fetch track information", progress=0)
                 return
@@ -680,7 +760,7 @@ def reverse_download_and_process(
                 'id': job_id,
                 'name': name,
                 'artist': artist,
-                'artists': [a.strip() for a in re.split(r"[;,]", artist) if a.strip()],
+                'artists': [a.strip() for a in artist.replace(";", ",").split(",") if a.strip()],
                 'album_artist': album_artist,
                 'album': album,
                 'track_number': int(md.get('track_number') or 1),
@@ -691,35 +771,32 @@ def reverse_download_and_process(
                 'preview_url': None,
             }
 
-        upsert_job(job_id, status="processing", message="Preparing download location...", stage="preparing",
-                   progress=20)
+        upsert_job_debounced(job_id, status="processing", message="Preparing download location...", stage="preparing",
+                             progress=20)
 
         # Determine download path
-        temp_dir = os.path.join(config.DOWNLOAD_DIR, "temp")
-        Path(temp_dir).mkdir(parents=True, exist_ok=True)
-        download_path = get_download_path(track_info, temp_dir, config.OUTPUT_FORMAT)
+        download_path = get_download_path(track_info, TEMP_DIR_STR, config.OUTPUT_FORMAT)
 
-        upsert_job(job_id, status="processing", message="Downloading from YouTube...", stage="downloading", progress=40)
-        download_result = youtube_service.download_by_video_id(video_id, download_path)
+        upsert_job_debounced(job_id, status="processing", message="Downloading from YouTube...", stage="downloading", progress=40)
+        with _youtube_slots:
+            download_result = youtube_service.download_by_video_id(video_id, download_path, overwrite=True)
         if not download_result.get('success'):
             upsert_job(job_id, status="error",
                        message=f"Download failed: {download_result.get('error', 'Unknown error')}", progress=0)
             return
 
-        upsert_job(job_id, status="processing", message="Applying metadata...", stage="tagging", progress=80)
+        upsert_job_debounced(job_id, status="processing", message="Applying metadata...", stage="tagging", progress=80)
         metadata_service.apply_metadata(download_result['file_path'], track_info)
 
         # Handle completion based on location
         if location == "navidrome":
-            upsert_job(job_id, status="processing", message="Copying to Navidrome library...", stage="copying",
-                       progress=90)
+            upsert_job_debounced(job_id, status="processing", message="Copying to Navidrome library...", stage="copying",
+                                 progress=90)
             try:
                 target_path = navidrome_service.get_target_path(
                     track_info, config.OUTPUT_FORMAT, navidrome_library_path
                 )
-                shutil.copy2(download_result['file_path'], target_path)
-                if os.path.exists(download_result['file_path']):
-                    os.remove(download_result['file_path'])
+                fast_move(download_result['file_path'], target_path)
 
                 navidrome_result = navidrome_service.finalize_track(str(target_path))
                 upsert_job(job_id,
@@ -752,7 +829,7 @@ def reverse_download_and_process(
 
 
 @app.post("/api/reverse/download")
-async def reverse_download(request: ReverseDownloadRequest, background_tasks: BackgroundTasks):
+def reverse_download(request: ReverseDownloadRequest):
     """Finalize reverse flow: download YouTube URL and tag with chosen track or manual metadata."""
     provider = resolve_metadata_provider(request.provider)
     get_metadata_service(provider)  # validate Spotify configured if needed
@@ -775,7 +852,9 @@ async def reverse_download(request: ReverseDownloadRequest, background_tasks: Ba
         if dup:
             raise HTTPException(status_code=409, detail=dup)
 
-    job_id = f"yt-{abs(hash((request.youtube_url, request.spotify_track_id or '', location, provider))) % 10_000_000}"
+    # Stable across restarts (str hash() is salted per process) and collision-safe
+    job_key = f"{request.youtube_url}|{request.spotify_track_id or ''}|{location}|{provider}"
+    job_id = f"yt-{hashlib.blake2b(job_key.encode('utf-8'), digest_size=8).hexdigest()}"
 
     upsert_job(
         job_id,
@@ -786,7 +865,7 @@ async def reverse_download(request: ReverseDownloadRequest, background_tasks: Ba
         payload={"provider": provider, "record_track_id": request.spotify_track_id},
     )
 
-    background_tasks.add_task(
+    app.state.download_executor.submit(
         reverse_download_and_process,
         job_id,
         request.youtube_url,
@@ -805,7 +884,7 @@ async def reverse_download(request: ReverseDownloadRequest, background_tasks: Ba
 
 
 @app.get("/api/download/status/{track_id}")
-async def get_download_status(track_id: str):
+def get_download_status(track_id: str):
     job = get_job(track_id)
     if not job:
         raise HTTPException(status_code=404, detail="Download not found")
@@ -822,7 +901,7 @@ async def get_download_status(track_id: str):
 
 
 @app.post("/api/download/album")
-async def download_album(request: AlbumDownloadRequest, background_tasks: BackgroundTasks):
+def download_album(request: AlbumDownloadRequest):
     """Start downloading all tracks from an album"""
 
     provider = resolve_metadata_provider(request.provider)
@@ -834,6 +913,8 @@ async def download_album(request: AlbumDownloadRequest, background_tasks: Backgr
     if not album:
         raise HTTPException(status_code=404, detail="Album not found")
 
+    prime_album_track_cache(provider, album)
+
     # Validate location
     location = request.location if request.location in ["local", "navidrome"] else "local"
     location_msg = "local downloads folder" if location == "local" else "Navidrome server"
@@ -843,19 +924,24 @@ async def download_album(request: AlbumDownloadRequest, background_tasks: Backgr
     if location == "navidrome":
         navidrome_path = resolve_navidrome_library_path_optional(request.navidrome_library)
 
-    to_queue = []
-    for track in album["tracks"]:
-        if (
-            get_duplicate_download_reason(
-                track["id"],
-                provider,
-                location,
-                output_format,
-                navidrome_library_path=navidrome_path,
-            )
-            is None
-        ):
-            to_queue.append(track)
+    def duplicate_reason(track: Dict) -> Optional[str]:
+        return get_duplicate_download_reason(
+            track["id"],
+            provider,
+            location,
+            output_format,
+            track_info=get_cached_track(provider, track["id"]),
+            navidrome_library_path=navidrome_path,
+        )
+
+    # Existence checks are stat + SQLite reads per track; run them side by side for big albums
+    tracks = album["tracks"]
+    if len(tracks) > 1:
+        with ThreadPoolExecutor(max_workers=min(16, len(tracks))) as pool:
+            reasons = list(pool.map(duplicate_reason, tracks))
+    else:
+        reasons = [duplicate_reason(t) for t in tracks]
+    to_queue = [t for t, reason in zip(tracks, reasons) if reason is None]
 
     if not to_queue:
         raise HTTPException(
@@ -879,17 +965,29 @@ async def download_album(request: AlbumDownloadRequest, background_tasks: Backgr
         },
     )
 
-    for track in to_queue:
-        upsert_job(
+    # Covers are fetched once up front; each track's tagging then hits the in-memory art cache.
+    # A short-lived thread, so the prefetch never occupies one of the bounded download workers.
+    threading.Thread(
+        target=metadata_service.prefetch_album_art, args=(to_queue,), name="album-art-prefetch", daemon=True
+    ).start()
+
+    # All track rows in one transaction, before any worker can pick a track up
+    upsert_jobs_many([
+        (
             track["id"],
-            status="queued",
-            message=f"Queued (Album: {album['name']})",
-            progress=0,
-            stage="queued",
-            album_id=request.album_id,
-            payload={"provider": provider, "record_track_id": track["id"]},
+            {
+                "status": "queued",
+                "message": f"Queued (Album: {album['name']})",
+                "progress": 0,
+                "stage": "queued",
+                "album_id": request.album_id,
+                "payload": {"provider": provider, "record_track_id": track["id"]},
+            },
         )
-        background_tasks.add_task(
+        for track in to_queue
+    ])
+    for track in to_queue:
+        app.state.download_executor.submit(
             download_album_track,
             track["id"],
             location,
@@ -899,6 +997,7 @@ async def download_album(request: AlbumDownloadRequest, background_tasks: Backgr
             provider,
             _clamp_download_retries(request.max_retries),
             navidrome_path,
+            get_cached_track(provider, track["id"]),
         )
 
     skipped = len(album["tracks"]) - len(to_queue)
@@ -922,6 +1021,7 @@ def download_album_track(
     metadata_provider: str = "deezer",
     max_retries: int = 0,
     navidrome_library_path: Optional[str] = None,
+    track_info: Optional[Dict] = None,
 ):
     try:
         download_and_process(
@@ -933,6 +1033,7 @@ def download_album_track(
             metadata_provider,
             max_retries,
             navidrome_library_path,
+            track_info,
         )
     except Exception as e:
         print(f"Error downloading album track {track_id}: {e}")
@@ -940,9 +1041,9 @@ def download_album_track(
 
 
 @app.get("/api/download/album/status/{album_id}")
-async def get_album_download_status(album_id: str):
+def get_album_download_status(album_id: str):
     album_job_id = f"album:{album_id}"
-    meta_job = get_job(album_job_id)
+    meta_job = get_job(album_job_id, with_payload=True)
 
     agg = get_album_aggregate(album_id, exclude_job_id=album_job_id)
 
@@ -966,12 +1067,12 @@ async def get_album_download_status(album_id: str):
 
 
 @app.get("/api/youtube/candidates/{track_id}")
-async def get_youtube_candidates(track_id: str, provider: Optional[str] = Query(None)):
+def get_youtube_candidates(track_id: str, provider: Optional[str] = Query(None)):
     """Get YouTube candidates for a track to let user choose if confidence is low"""
     p = resolve_metadata_provider(provider)
-    svc = get_metadata_service(p)
+    get_metadata_service(p)
     try:
-        track_info = svc.get_track_details(track_id)
+        track_info = get_track_details_cached(p, track_id)
         if not track_info:
             raise HTTPException(status_code=404, detail="Track not found")
 
@@ -996,9 +1097,15 @@ async def get_youtube_candidates(track_id: str, provider: Optional[str] = Query(
         raise HTTPException(status_code=500, detail=f"Error searching YouTube: {str(e)}")
 
 
+class AudioFileResponse(FileResponse):
+    """FileResponse with 1 MiB reads: audio files are several MB, 64 KiB chunks mean many more sends."""
+
+    chunk_size = 1 << 20
+
+
 @app.get("/api/download/file/{track_id}")
-async def download_file(track_id: str, filename: str = Query(...),
-                        background_tasks: BackgroundTasks = BackgroundTasks()):
+def download_file(request: Request, track_id: str, filename: str = Query(...),
+                  background_tasks: BackgroundTasks = BackgroundTasks()):
     """Download a file (for local browser downloads) and delete temp file afterward"""
 
     job = get_job(track_id)
@@ -1009,7 +1116,11 @@ async def download_file(track_id: str, filename: str = Query(...),
         raise HTTPException(status_code=400, detail="File not ready for download")
 
     file_path = job.get("file_path")
-    if not file_path or not os.path.exists(file_path):
+    try:
+        file_stat = os.stat(file_path) if file_path else None
+    except OSError:
+        file_stat = None
+    if file_stat is None:
         raise HTTPException(status_code=404, detail="File not found")
 
     # Decode URL-encoded filename for comparison
@@ -1021,10 +1132,16 @@ async def download_file(track_id: str, filename: str = Query(...),
         raise HTTPException(status_code=400,
                             detail=f"Invalid filename. Expected: {actual_filename}, Got: {decoded_filename}")
 
+    # Browser retries of the same file get a 304 instead of the whole body again
+    etag = f'"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, max-age=3600"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=cache_headers)
+
     # Check if this is a temp file (for local downloads) - delete after serving
     # Normalize paths for comparison
-    temp_dir_path = str(Path(config.DOWNLOAD_DIR) / "temp")
-    is_temp_file = temp_dir_path in file_path or "temp" in os.path.dirname(file_path)
+    is_temp_file = Path(file_path).resolve().is_relative_to(TEMP_DIR_RESOLVED)
 
     # Return file for browser to download (saves to user's Downloads folder)
     # Use RFC 5987 encoding for non-ASCII filenames in Content-Disposition header
@@ -1042,12 +1159,14 @@ async def download_file(track_id: str, filename: str = Query(...),
         ".webm": "audio/webm",
     }.get(ext, "application/octet-stream")
 
-    response = FileResponse(
+    response = AudioFileResponse(
         file_path,
         media_type=media_type,
+        stat_result=file_stat,
         filename=ascii_filename,  # Fallback ASCII filename
         headers={
-            "Content-Disposition": f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{encoded_filename}"
+            "Content-Disposition": f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{encoded_filename}",
+            **cache_headers,
         }
     )
 
@@ -1058,15 +1177,16 @@ async def download_file(track_id: str, filename: str = Query(...),
     return response
 
 
-def cleanup_temp_file(file_path: str, _job_id: str):
+async def cleanup_temp_file(file_path: str, _job_id: str):
     """Clean up temporary download file after it's been served (local browser downloads).
 
-    We do not record completed_track_downloads here — that table is for Navidrome
-    library copies only (see download_and_process).
+    Runs on the event loop after the body has been sent, so the wait does not hold a
+    threadpool worker. We do not record completed_track_downloads here — that table is
+    for Navidrome library copies only (see download_and_process).
     """
     try:
         # Long delay so duplicate requests (extra tabs, extensions, browser retries) still hit the file
-        time.sleep(max(2, config.TEMP_FILE_CLEANUP_DELAY_SEC))
+        await asyncio.sleep(max(2, config.TEMP_FILE_CLEANUP_DELAY_SEC))
         if os.path.exists(file_path):
             os.remove(file_path)
             print(f"Cleaned up temp file: {file_path}")
@@ -1074,6 +1194,14 @@ def cleanup_temp_file(file_path: str, _job_id: str):
         print(f"Error cleaning up temp file {file_path}: {e}")
 
 
+@app.post("/api/cache/clear")
+def clear_caches():
+    """Drop cached YouTube metadata (video info, candidate searches) and catalog track details."""
+    removed = clear_youtube_metadata_cache()
+    clear_track_cache()
+    return {"status": "cleared", "youtube_entries_removed": removed}
+
+
 @app.get("/api/navidrome/libraries")
 async def list_navidrome_libraries():
     """Configured Navidrome music folder roots (from NAVIDROME_MUSIC_PATHS / labels)."""
@@ -1081,7 +1209,7 @@ async def list_navidrome_libraries():
 
 
 @app.get("/api/track/{track_id}/exists")
-async def check_track_exists(
+def check_track_exists(
     track_id: str,
     provider: Optional[str] = Query(None),
     location: str = Query("local"),
@@ -1095,19 +1223,19 @@ async def check_track_exists(
       or any configured library if navidrome_library is omitted; also completion DB / temp.
     """
     p = resolve_metadata_provider(provider)
-    svc = get_metadata_service(p)
+    get_metadata_service(p)
     try:
         if location not in ("local", "navidrome"):
             location = "local"
 
-        track_info = svc.get_track_details(track_id)
+        track_info = get_track_details_cached(p, track_id)
         if not track_info:
             return {"exists": False, "file_path": None}
 
         ext = config.OUTPUT_FORMAT
         download_path = get_download_path(track_info, config.DOWNLOAD_DIR, ext)
         temp_path = get_download_path(
-            track_info, os.path.join(config.DOWNLOAD_DIR, "temp"), ext
+            track_info, TEMP_DIR_STR, ext
         )
 
         if location == "local":
@@ -1,10 +1,17 @@
 import os
 import re
-from pathlib import Path
+from functools import lru_cache
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 
-load_dotenv()
+
+@lru_cache(maxsize=1)
+def _load_env() -> None:
+    """Parse .env once per process (later calls, e.g. from reloaders or tests, are no-ops)."""
+    load_dotenv()
+
+
+_load_env()
 
 # Metadata provider: "deezer" (default, no API key) or "spotify" (requires credentials)
 _raw_provider = os.getenv("DEFAULT_METADATA_PROVIDER", "deezer").lower().strip()
@@ -82,17 +89,36 @@ OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "mp3")
 AUDIO_QUALITY = os.getenv("AUDIO_QUALITY", "128")  # kbps (lower = smaller files, 128 is good balance)
 # Seconds to keep browser temp files after first serve (stray duplicate GETs then get 200 instead of 404)
 TEMP_FILE_CLEANUP_DELAY_SEC = int(os.getenv("TEMP_FILE_CLEANUP_DELAY_SEC", "60"))
+# Download jobs run on a bounded worker pool (album tracks download in parallel up to this many)
+MAX_CONCURRENT_DOWNLOADS = max(1, int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "4")))
+# Per-host caps inside the pool so parallel jobs don't all hit YouTube / the catalog API at once
+YOUTUBE_MAX_CONCURRENT = max(1, int(os.getenv("YOUTUBE_MAX_CONCURRENT", "3")))
+CATALOG_MAX_CONCURRENT = max(1, int(os.getenv("CATALOG_MAX_CONCURRENT", "4")))
+# Cover art larger than this (bytes) is skipped instead of embedded
+MAX_ART_BYTES = int(os.getenv("MAX_ART_BYTES", str(2 * 1024 * 1024)))
 
 # YouTube Configuration
 YOUTUBE_COOKIES_PATH = os.getenv("YOUTUBE_COOKIES_PATH", "")  # Path to YouTube cookies file (Netscape format) for yt-dlp
+# Video info / candidate searches are cached (memory + jobs DB) so preview -> pick -> download reuses them
+YOUTUBE_METADATA_CACHE_TTL_SEC = int(os.getenv("YOUTUBE_METADATA_CACHE_TTL_SEC", "3600"))
+# A video's title/uploader/duration rarely change, so single-video info may outlive searches
+YOUTUBE_VIDEO_INFO_CACHE_TTL_SEC = int(os.getenv("YOUTUBE_VIDEO_INFO_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+YOUTUBE_METADATA_CACHE_MAXSIZE = int(os.getenv("YOUTUBE_METADATA_CACHE_MAXSIZE", "2000"))
 
 # API Configuration
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
-CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",")
-
-# Create directories if they don't exist
-Path(DOWNLOAD_DIR).mkdir(parents=True, exist_ok=True)
-for _nav_root in NAVIDROME_MUSIC_PATHS_LIST:
-    Path(_nav_root).mkdir(parents=True, exist_ok=True)
+CORS_ORIGINS = tuple(
+    o.strip()
+    for o in os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",")
+    if o.strip()
+)
+
+
+@lru_cache(maxsize=1)
+def ensure_dirs() -> None:
+    """Create the download and Navidrome roots; called from app startup, not on import."""
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    for nav_root in NAVIDROME_MUSIC_PATHS_LIST:
+        os.makedirs(nav_root, exist_ok=True)
 
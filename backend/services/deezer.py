@@ -1,4 +1,5 @@
 """Deezer public API — no API key required for catalog search."""
+import orjson
 import requests
 from typing import List, Dict, Optional
 import sys
@@ -8,12 +9,16 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 BASE = "https://api.deezer.com"
 
+# One keep-alive pool for all catalog calls (request handlers and download workers share it)
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
 
 def _get(path: str, params: Optional[dict] = None) -> dict:
     url = f"{BASE}{path}" if path.startswith("/") else f"{BASE}/{path}"
-    r = requests.get(url, params=params or {}, timeout=15)
+    r = _session.get(url, params=params or {}, timeout=15)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     if isinstance(data, dict) and data.get("error"):
         err = data["error"]
         raise RuntimeError(err.get("message", str(err)))
@@ -105,9 +110,9 @@ class DeezerService:
         next_url = track_list.get("next")
         while next_url:
             try:
-                page = requests.get(next_url, timeout=15)
+                page = _session.get(next_url, timeout=15)
                 page.raise_for_status()
-                chunk = page.json()
+                chunk = orjson.loads(page.content)
                 for t in chunk.get("data") or []:
                     tracks.append(_track_from_api(t))
                 next_url = chunk.get("next")
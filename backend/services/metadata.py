@@ -1,179 +1,276 @@
+import base64
+import hashlib
+import logging
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from mutagen.id3 import ID3, TIT2, TPE1, TPE2, TALB, APIC, TDRC, TRCK
-from mutagen.mp3 import MP3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from mutagen.id3 import ID3, ID3NoHeaderError, TIT2, TPE1, TPE2, TALB, APIC, TDRC, TRCK
 from mutagen.flac import FLAC, Picture
 from mutagen.mp4 import MP4, MP4Cover
-from typing import Dict
-from pathlib import Path
+from mutagen.oggopus import OggOpus
+from mutagen.oggvorbis import OggVorbis
+from typing import Callable, Dict, List, Tuple
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+logger = logging.getLogger(__name__)
+
+# Album tracks share one cover URL; keep recently fetched art in memory (bounded by total bytes)
+ART_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Slack left after the ID3 tag so later edits rewrite only the header, not the audio
+ID3_PADDING = 2048
+
+
+def _id3_padding(info) -> int:
+    """Keep existing padding when the new tag fits; otherwise reserve ID3_PADDING."""
+    return info.padding if 0 <= info.padding <= 64 * 1024 else ID3_PADDING
+
+
+def _norm_artists(artists: str) -> Tuple[str, str]:
+    """Return (artists joined with ';', first artist) for a ',' or ';' separated string."""
+    joined = artists.replace(',', ';')
+    return joined, joined.partition(';')[0].strip()
+
+
+def _open_id3(file_path: str) -> ID3:
+    # Only the ID3 block is read; MP3() would also parse the MPEG stream. translate (the
+    # default) upgrades v2.3 frames such as TYER so the v2.4 save does not keep them
+    try:
+        return ID3(file_path)
+    except ID3NoHeaderError:
+        return ID3()
+
+
+def _set_id3_tags(audio: ID3, track_info: Dict, art_bytes: bytes | None) -> None:
+    # Artist names are joined with semicolons; album artist is only the first one
+    artist = track_info.get('artist', '')
+    if isinstance(artist, str):
+        artist = _norm_artists(artist)[0]
+
+    artist_name = ''
+    if isinstance(track_info.get('album_artist'), str):
+        artist_name = _norm_artists(track_info['album_artist'])[1]
+
+    audio['TIT2'] = TIT2(encoding=3, text=track_info.get('name', ''))
+    audio['TPE1'] = TPE1(encoding=3, text=artist)
+    audio['TPE2'] = TPE2(encoding=3, text=artist_name)
+    audio['TALB'] = TALB(encoding=3, text=track_info.get('album', ''))
+    audio['TRCK'] = TRCK(encoding=3, text=str(track_info.get('track_number', 1)))
+
+    if track_info.get('release_date'):
+        audio['TDRC'] = TDRC(encoding=3, text=str(track_info['release_date'])[:4])
+
+    if art_bytes:
+        audio.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=art_bytes))
+
+
+def _set_vorbis_tags(audio, track_info: Dict, art_bytes: bytes | None) -> None:
+    """FLAC and Ogg (Vorbis/Opus) share Vorbis comments; only cover storage differs."""
+    audio['TITLE'] = track_info.get('name', '')
+    audio['ARTIST'] = track_info.get('artist', '')
+    audio['ALBUM'] = track_info.get('album', '')
+    audio['TRACKNUMBER'] = str(track_info.get('track_number', 1))
+
+    if track_info.get('release_date'):
+        audio['DATE'] = str(track_info['release_date'])[:4]
+
+    if art_bytes:
+        picture = Picture()
+        picture.type = 3  # Cover (front)
+        picture.mime = 'image/jpeg'
+        picture.data = art_bytes
+        if isinstance(audio, FLAC):
+            # Replace rather than append, or every re-tag stacks another cover
+            audio.clear_pictures()
+            audio.add_picture(picture)
+        else:
+            audio['METADATA_BLOCK_PICTURE'] = [base64.b64encode(picture.write()).decode('ascii')]
+
+
+def _set_mp4_tags(audio: MP4, track_info: Dict, art_bytes: bytes | None) -> None:
+    title = track_info.get('name', '')
+    artist = track_info.get('artist', '')
+    album = track_info.get('album', '')
+    track_number = track_info.get('track_number', 1)
+    album_artist = track_info.get('album_artist')
+
+    if isinstance(artist, str):
+        # MP4 typically expects a list for artists
+        artists = [a.strip() for a in artist.replace(';', ',').split(',') if a.strip()]
+    else:
+        artists = []
+
+    audio['\xa9nam'] = [title] if title else []
+    audio['\xa9ART'] = artists
+    audio['\xa9alb'] = [album] if album else []
+
+    if album_artist and isinstance(album_artist, str):
+        aa = _norm_artists(album_artist)[1]
+        audio['aART'] = [aa] if aa else []
+
+    # track number is tuple: (track, total)
+    try:
+        audio['trkn'] = [(int(track_number), 0)]
+    except Exception:
+        pass
+
+    if track_info.get('release_date'):
+        audio['\xa9day'] = [str(track_info['release_date'])[:4]]
+
+    if art_bytes:
+        audio['covr'] = [MP4Cover(art_bytes, imageformat=MP4Cover.FORMAT_JPEG)]
+
+
+# Extension -> (open tags, assign fields); a new format is one more row here
+FORMAT_HANDLERS: Dict[str, Tuple[Callable[[str], object], Callable[[object, Dict, bytes | None], None]]] = {
+    '.mp3': (_open_id3, _set_id3_tags),
+    '.flac': (FLAC, _set_vorbis_tags),
+    '.m4a': (MP4, _set_mp4_tags),
+    '.ogg': (OggVorbis, _set_vorbis_tags),
+    '.opus': (OggOpus, _set_vorbis_tags),
+}
+
 
 class MetadataService:
     def __init__(self):
-        pass
+        # Keep-alive pool for cover art: every track of an album hits the same image CDN
+        self._session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers.update({
+            'User-Agent': 'Mozilla/5.0',
+            'Accept': 'image/jpeg,image/*;q=0.8',
+        })
+        self._art_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._art_cache_bytes = 0
+        self._art_cache_lock = threading.Lock()
+
+    def close(self) -> None:
+        self._session.close()
 
     def apply_metadata(self, file_path: str, track_info: Dict) -> bool:
         """Apply metadata and album art to audio file"""
         try:
-            file_ext = Path(file_path).suffix.lower()
-
-            if file_ext == '.mp3':
-                return self._apply_mp3_metadata(file_path, track_info)
-            elif file_ext == '.flac':
-                return self._apply_flac_metadata(file_path, track_info)
-            elif file_ext == '.m4a':
-                return self._apply_m4a_metadata(file_path, track_info)
-            else:
-                print(f"Metadata tagging not supported for {file_ext}")
+            file_ext = os.path.splitext(file_path)[1].lower()
+            handler = FORMAT_HANDLERS.get(file_ext)
+            if handler is None:
+                logger.info("Metadata tagging not supported for %s", file_ext)
                 return False
+            open_tags, set_tags = handler
 
-        except Exception as e:
-            print(f"Error applying metadata: {e}")
-            return False
+            art_bytes = self._download_album_art(track_info.get('album_art'))
+            audio = open_tags(file_path)
+            before = self._tag_fingerprint(audio)
+            set_tags(audio, track_info, art_bytes)
+            if self._tag_fingerprint(audio) == before:
+                return True
 
-    def _download_album_art(self, url: str) -> bytes | None:
-        if not url:
-            return None
-        try:
-            response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-            if response.status_code == 200:
-                return response.content
-        except Exception as e:
-            print(f"Error downloading album art: {e}")
-        return None
-
-    def _apply_mp3_metadata(self, file_path: str, track_info: Dict) -> bool:
-        """Apply metadata to MP3 file"""
-        try:
-            # Ensure artist names are joined with semicolons
-            if 'artist' in track_info and isinstance(track_info.get('artist'), str):
-                track_info['artist'] = track_info['artist'].replace(',', ';')
-
-            artist_name = ''
-            if 'album_artist' in track_info and isinstance(track_info.get('album_artist'), str):
-                track_info['album_artist'] = track_info['album_artist'].replace(',', ';')
-                # Extract only the first artist for album artist
-                artist_name = track_info['album_artist'].split(';')[0].strip()
-
-            audio = MP3(file_path, ID3=ID3)
-
-            # Add ID3 tag if it doesn't exist
-            try:
-                audio.add_tags()
-            except Exception:
-                pass
-
-            # Set basic metadata
-            audio['TIT2'] = TIT2(encoding=3, text=track_info.get('name', ''))
-            audio['TPE1'] = TPE1(encoding=3, text=track_info.get('artist', ''))
-            audio['TPE2'] = TPE2(encoding=3, text=artist_name)
-            audio['TALB'] = TALB(encoding=3, text=track_info.get('album', ''))
-            audio['TRCK'] = TRCK(encoding=3, text=str(track_info.get('track_number', 1)))
-
-            if track_info.get('release_date'):
-                audio['TDRC'] = TDRC(encoding=3, text=str(track_info['release_date'])[:4])
-
-            # Add album art
-            if track_info.get('album_art'):
-                art_bytes = self._download_album_art(track_info.get('album_art'))
-                if art_bytes:
-                    try:
-                        audio.tags.add(APIC(
-                            encoding=3,
-                            mime='image/jpeg',
-                            type=3,
-                            desc='Cover',
-                            data=art_bytes
-                        ))
-                    except Exception as e:
-                        print(f"Error adding album art: {e}")
-
-            audio.save()
+            if isinstance(audio, ID3):
+                audio.save(file_path, v2_version=4, padding=_id3_padding)
+            else:
+                audio.save()
             return True
 
         except Exception as e:
-            print(f"Error applying MP3 metadata: {e}")
+            logger.exception("Error applying metadata to %s", file_path)
             return False
 
-    def _apply_flac_metadata(self, file_path: str, track_info: Dict) -> bool:
-        """Apply metadata to FLAC file"""
-        try:
-            audio = FLAC(file_path)
-
-            audio['TITLE'] = track_info.get('name', '')
-            audio['ARTIST'] = track_info.get('artist', '')
-            audio['ALBUM'] = track_info.get('album', '')
-            audio['TRACKNUMBER'] = str(track_info.get('track_number', 1))
-
-            if track_info.get('release_date'):
-                audio['DATE'] = str(track_info['release_date'])[:4]
-
-            if track_info.get('album_art'):
-                art_bytes = self._download_album_art(track_info.get('album_art'))
-                if art_bytes:
-                    try:
-                        picture = Picture()
-                        picture.type = 3  # Cover (front)
-                        picture.mime = 'image/jpeg'
-                        picture.data = art_bytes
-                        audio.add_picture(picture)
-                    except Exception as e:
-                        print(f"Error adding album art: {e}")
-
-            audio.save()
-            return True
+    @staticmethod
+    def _art_cache_key(url: str) -> str:
+        # Fragments never reach the server; query strings can (signed thumbnails), so keep them
+        return url.strip().split('#', 1)[0]
 
-        except Exception as e:
-            print(f"Error applying FLAC metadata: {e}")
-            return False
+    def _cached_album_art(self, key: str) -> bytes | None:
+        with self._art_cache_lock:
+            data = self._art_cache.get(key)
+            if data is not None:
+                self._art_cache.move_to_end(key)
+            return data
 
-    def _apply_m4a_metadata(self, file_path: str, track_info: Dict) -> bool:
-        """Apply metadata to M4A (MP4) file."""
-        try:
-            audio = MP4(file_path)
+    def _cache_album_art(self, key: str, data: bytes) -> None:
+        if len(data) > ART_CACHE_MAX_BYTES:
+            return
+        with self._art_cache_lock:
+            old = self._art_cache.pop(key, None)
+            if old is not None:
+                self._art_cache_bytes -= len(old)
+            self._art_cache[key] = data
+            self._art_cache_bytes += len(data)
+            while self._art_cache_bytes > ART_CACHE_MAX_BYTES:
+                _, evicted = self._art_cache.popitem(last=False)
+                self._art_cache_bytes -= len(evicted)
 
-            title = track_info.get('name', '')
-            artist = track_info.get('artist', '')
-            album = track_info.get('album', '')
-            track_number = track_info.get('track_number', 1)
-            album_artist = track_info.get('album_artist')
+    def prefetch_album_art(self, track_infos: List[Dict], max_workers: int = 8) -> Dict[str, bytes]:
+        """Fetch each distinct album_art URL once, concurrently, into the art cache.
 
-            if isinstance(artist, str):
-                # MP4 typically expects a list for artists
-                artists = [a.strip() for a in artist.replace(';', ',').split(',') if a.strip()]
-            else:
-                artists = []
-
-            audio['\xa9nam'] = [title] if title else []
-            audio['\xa9ART'] = artists
-            audio['\xa9alb'] = [album] if album else []
-
-            if album_artist and isinstance(album_artist, str):
-                aa = album_artist.split(',')[0].split(';')[0].strip()
-                audio['aART'] = [aa] if aa else []
-
-            # track number is tuple: (track, total)
-            try:
-                audio['trkn'] = [(int(track_number), 0)]
-            except Exception:
-                pass
-
-            if track_info.get('release_date'):
-                year = str(track_info['release_date'])[:4]
-                audio['\xa9day'] = [year]
-
-            # Album art
-            art_url = track_info.get('album_art')
-            if art_url:
-                art_bytes = self._download_album_art(art_url)
-                if art_bytes:
-                    # Mutagen uses MP4Cover with imageformat
-                    cover = MP4Cover(art_bytes, imageformat=MP4Cover.FORMAT_JPEG)
-                    audio['covr'] = [cover]
-
-            audio.save()
-            return True
+        Taggers then read covers from memory. Returns {url: bytes} for the fetched URLs.
+        """
+        urls = list(dict.fromkeys(t.get('album_art') for t in track_infos if t.get('album_art')))
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as pool:
+            fetched = list(pool.map(self._download_album_art, urls))
+        return {url: data for url, data in zip(urls, fetched) if data}
 
+    def _download_album_art(self, url: str) -> bytes | None:
+        if not url:
+            return None
+        key = self._art_cache_key(url)
+        cached = self._cached_album_art(key)
+        if cached is not None:
+            return cached
+        try:
+            with self._session.get(url, timeout=10, stream=True) as response:
+                if response.status_code != 200:
+                    return None
+                content_type = response.headers.get('Content-Type', '')
+                if content_type and not content_type.startswith('image/'):
+                    logger.warning("Skipping album art with content type %s: %s", content_type, url)
+                    return None
+                declared = int(response.headers.get('Content-Length') or 0)
+                if declared > config.MAX_ART_BYTES:
+                    logger.warning("Skipping album art larger than %d bytes: %s", config.MAX_ART_BYTES, url)
+                    return None
+                buf = bytearray()
+                for chunk in response.iter_content(65536):
+                    buf += chunk
+                    if len(buf) > config.MAX_ART_BYTES:
+                        logger.warning("Skipping album art larger than %d bytes: %s", config.MAX_ART_BYTES, url)
+                        return None
+            data = bytes(buf)
+            self._cache_album_art(key, data)
+            return data
         except Exception as e:
-            print(f"Error applying M4A metadata: {e}")
-            return False
+            logger.warning("Error downloading album art from %s: %s", url, e)
+        return None
+
+    @staticmethod
+    def _tag_fingerprint(audio) -> bytes:
+        """Digest of the file's current tags, embedded art included.
 
+        apply_metadata compares it before and after assigning fields and skips save()
+        when nothing changed, so re-tagging an already tagged file does no I/O.
+        """
+        h = hashlib.blake2b(digest_size=8)
+        tags = audio if isinstance(audio, ID3) else audio.tags
+        if tags is not None:
+            for key in sorted(tags.keys()):
+                h.update(key.encode('utf-8', 'surrogateescape') + b'\0')
+                values = tags[key]
+                for value in values if isinstance(values, list) else [values]:
+                    # APIC frames and MP4Cover carry raw image bytes; hash those directly
+                    data = getattr(value, 'data', value)
+                    h.update(data if isinstance(data, bytes) else repr(data).encode('utf-8', 'surrogateescape'))
+                    h.update(b'\0')
+        for picture in getattr(audio, 'pictures', ()):
+            h.update(picture.data)
+        return h.digest()
@@ -6,6 +6,7 @@ from pathlib import Path
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
+from utils.file_handler import sanitize_filename
 
 class NavidromeService:
     def __init__(self):
@@ -147,21 +148,9 @@ class NavidromeService:
     
     def _sanitize_path(self, path: str) -> str:
         """Remove invalid characters from path"""
-        import re
-        # Remove invalid characters
-        path = re.sub(r'[<>:"/\\|?*]', '', path)
-        # Replace multiple spaces with single space
-        path = re.sub(r'\s+', ' ', path)
-        # Trim
-        return path.strip()
+        return sanitize_filename(path)
     
     def _sanitize_filename(self, filename: str) -> str:
         """Remove invalid characters from filename"""
-        import re
-        # Remove invalid characters
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-        # Replace multiple spaces with single space
-        filename = re.sub(r'\s+', ' ', filename)
-        # Trim
-        return filename.strip()
+        return sanitize_filename(filename)
 
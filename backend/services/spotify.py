@@ -75,29 +75,49 @@ class SpotifyService:
             print(f"Spotify search error: {e}")
             raise
 
+    @staticmethod
+    def _track_details_from_api(track: Dict) -> Dict:
+        return {
+            "id": track["id"],
+            "name": track["name"],
+            "artists": [artist["name"] for artist in track["artists"]],
+            "artist": ", ".join([artist["name"] for artist in track["artists"]]),
+            "album_artists": [album_artist["name"] for album_artist in track["album"]["artists"]],
+            "album_artist": ", ".join([album_artist["name"] for album_artist in track["album"]["artists"]]),
+            "album": track["album"]["name"],
+            "album_id": track["album"]["id"],
+            "duration_ms": track["duration_ms"],
+            "external_url": track["external_urls"]["spotify"],
+            "preview_url": track.get("preview_url"),
+            "track_number": track.get("track_number", 1),
+            "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
+            "release_date": track["album"].get("release_date", ""),
+        }
+
     def get_track_details(self, track_id: str) -> Optional[Dict]:
         try:
             track = self._call(self.client.track, track_id)
-            return {
-                "id": track["id"],
-                "name": track["name"],
-                "artists": [artist["name"] for artist in track["artists"]],
-                "artist": ", ".join([artist["name"] for artist in track["artists"]]),
-                "album_artists": [album_artist["name"] for album_artist in track["album"]["artists"]],
-                "album_artist": ", ".join([album_artist["name"] for album_artist in track["album"]["artists"]]),
-                "album": track["album"]["name"],
-                "album_id": track["album"]["id"],
-                "duration_ms": track["duration_ms"],
-                "external_url": track["external_urls"]["spotify"],
-                "preview_url": track.get("preview_url"),
-                "track_number": track.get("track_number", 1),
-                "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
-                "release_date": track["album"].get("release_date", ""),
-            }
+            return self._track_details_from_api(track)
         except Exception as e:
             print(f"Error fetching track details: {e}")
             return None
 
+    def get_tracks_bulk(self, track_ids: List[str]) -> Dict[str, Dict]:
+        """Full track details for many ids via GET /v1/tracks (50 ids per request), keyed by id."""
+        out: Dict[str, Dict] = {}
+        ids = [t for t in dict.fromkeys(track_ids) if t]
+        for i in range(0, len(ids), 50):
+            chunk = ids[i:i + 50]
+            try:
+                results = self._call(self.client.tracks, chunk)
+            except Exception as e:
+                print(f"Error fetching track details in bulk: {e}")
+                continue
+            for track in results.get("tracks") or []:
+                if track and track.get("id"):
+                    out[track["id"]] = self._track_details_from_api(track)
+        return out
+
     def search_albums(self, query: str, limit: int = 20) -> List[Dict]:
         """Search for albums on Spotify"""
         try:
@@ -1,15 +1,23 @@
+import mutagen
 import yt_dlp
 from ytmusicapi import YTMusic
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
 import os
 import re
+import heapq
 import math
-from difflib import SequenceMatcher
+from bisect import bisect_left
+from functools import lru_cache
 from typing import Optional, Dict, List, Any, Tuple
 from pathlib import Path
 import sys
+import threading
+from contextlib import contextmanager
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
+from utils.yt_cache import cache_get, cache_set, make_key
 
 # Confidence threshold - below this, show candidates to user
 CONFIDENCE_THRESHOLD = 0.65
@@ -18,6 +26,71 @@ CONFIDENCE_THRESHOLD = 0.65
 # (tuned to match the debug script's improved model)
 DEFAULT_RANK_STRENGTH = float(os.getenv("YTMUSIC_RANK_STRENGTH", "6.0"))
 
+# Compiled once; normalize_text runs several times per scored candidate
+# Whole-word meta tokens, longest first so "official music video" wins over "official"
+_RE_META = re.compile(
+    r"\b(?:official music video|official video|official audio|lyric video|music video"
+    r"|official|lyrics|audio|mv|hd|4k)\b"
+)
+_RE_BRACKET_META = re.compile(r"[(\[](?:official|mv|music video|lyrics|lyric video|audio|hd|4k)[^)\]]*[)\]]")
+_RE_FEAT = re.compile(r"\b(feat\.|feat|ft\.|ft)\b")
+_RE_WS = re.compile(r"\s+")
+_RE_FILENAME_BAD = re.compile(r'[<>:"/\\|?*]')
+_RE_VIDEO_ID = re.compile(r"[A-Za-z0-9_-]{11}")
+# heuristic_adjustment markers (substring semantics, like the `in` checks they replace)
+_RE_LIVE = re.compile(r"live|现场|現場")
+_RE_COVER = re.compile(r"cover|翻唱")
+
+# Idle YoutubeDL instances kept per option set (searches, metadata and downloads)
+YDL_POOL_MAX_IDLE = 4
+
+# Avoid HLS (m3u8) formats that get blocked - prefer direct audio formats
+_AUDIO_FORMAT = (
+    "bestaudio[ext=m4a][protocol!=m3u8]/bestaudio[ext=webm][protocol!=m3u8]/bestaudio[ext=opus][protocol!=m3u8]"
+    "/bestaudio[protocol!=m3u8]/best[ext=m4a][protocol!=m3u8]/best[ext=webm][protocol!=m3u8]"
+    "/best[height<=720][protocol!=m3u8]/best"
+)
+
+# duration_score steps: |delta| <= 5s -> 1.0, <= 15s -> 0.85, ... , > 60s -> 0.0
+_DURATION_BREAKS = (5.0, 15.0, 30.0, 60.0)
+_DURATION_SCORES = (1.0, 0.85, 0.65, 0.35, 0.0)
+
+
+# The catalog title/artists are the same for every candidate of a search, and each
+# candidate's title is normalized by several scorers; memoize the pure string work.
+@lru_cache(maxsize=4096)
+def _normalize_text_cached(s: str) -> str:
+    s = s.lower()
+
+    # unify separators
+    s = s.replace("–", " ").replace("—", " ").replace("-", " ").replace(":", " ")
+
+    # remove common meta tokens
+    s = _RE_META.sub(" ", s)
+
+    # remove bracketed meta (best-effort)
+    s = _RE_BRACKET_META.sub(" ", s)
+
+    # normalize feat tokens
+    s = _RE_FEAT.sub("feat", s)
+
+    # collapse whitespace
+    s = _RE_WS.sub(" ", s).strip()
+    return s
+
+
+@lru_cache(maxsize=64)
+def _rank_prior(rank: int, strength: float) -> float:
+    # Ranks are 1..num_results and strength takes one value per source, so this stays tiny
+    r = max(1, rank)
+    return math.exp(-(r - 1) / max(1e-6, strength))
+
+
+@lru_cache(maxsize=4096)
+def _tokens_cached(s: str) -> Tuple[str, ...]:
+    return tuple(_normalize_text_cached(s).split())
+
+
 class YouTubeService:
     def __init__(self):
         self.output_format = config.OUTPUT_FORMAT
@@ -28,6 +101,39 @@ class YouTubeService:
         except Exception as e:
             print(f"Failed to initialize YTMusic: {e}")
             self.ytmusic = None
+        self._ydl_idle: Dict[str, List[yt_dlp.YoutubeDL]] = {}
+        self._ydl_idle_lock = threading.Lock()
+
+    @contextmanager
+    def _pooled_ydl(self, ydl_opts: Dict, outtmpl: Optional[str] = None):
+        """YoutubeDL reused across calls with identical options.
+
+        Building one re-parses options and rebuilds cookie/extractor state, and a kept
+        instance keeps its HTTP connections to YouTube open. Instances are not
+        thread-safe, so each is checked out by one caller at a time; one that raised
+        is closed instead of returned. Downloads pass their per-file outtmpl separately
+        so it does not split the pool.
+        """
+        key = make_key("ydl_opts", ydl_opts)
+        with self._ydl_idle_lock:
+            idle = self._ydl_idle.get(key)
+            ydl = idle.pop() if idle else None
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(ydl_opts)
+        if outtmpl is not None:
+            ydl.params['outtmpl']['default'] = outtmpl
+        try:
+            yield ydl
+        except BaseException:
+            ydl.close()
+            raise
+        with self._ydl_idle_lock:
+            idle = self._ydl_idle.setdefault(key, [])
+            if len(idle) < YDL_POOL_MAX_IDLE:
+                idle.append(ydl)
+                ydl = None
+        if ydl is not None:
+            ydl.close()
 
     @staticmethod
     def _preferred_quality_for_extract(output_format: str, audio_quality: str) -> str:
@@ -54,6 +160,17 @@ class YouTubeService:
         )
         return "/".join(f"{s}>{t}" for s in sources)
 
+    @staticmethod
+    def _format_selector(output_format: str) -> str:
+        """yt-dlp format string; opus output tries YouTube's own opus stream first.
+
+        FFmpegExtractAudio remuxes with -c:a copy when the source codec already matches the
+        target (opus -> opus, like aac -> m4a), skipping the decode/encode entirely.
+        """
+        if (output_format or "").lower() == "opus":
+            return f"bestaudio[acodec=opus][protocol!=m3u8]/{_AUDIO_FORMAT}"
+        return _AUDIO_FORMAT
+
     @staticmethod
     def _output_base_path(output_path: str, output_format: str) -> str:
         """Strip trailing .ext from our target path (case-insensitive)."""
@@ -68,6 +185,24 @@ class YouTubeService:
         """yt-dlp requires %(ext)s or it may name files after the video title instead of base_path."""
         return f"{base_path}.%(ext)s"
 
+    @staticmethod
+    def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+        """(size, mtime_ns) of path, or None if it does not exist."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def _is_complete_audio(path: str) -> bool:
+        """True if mutagen can parse path as audio with a positive duration."""
+        try:
+            audio = mutagen.File(path)
+        except Exception:
+            return False
+        return audio is not None and (getattr(audio.info, "length", 0) or 0) > 0
+
     @staticmethod
     def _filepaths_from_info(info: Optional[Dict]) -> List[str]:
         """Collect candidate paths yt-dlp may attach after download/postprocess."""
@@ -100,13 +235,13 @@ class YouTubeService:
         if os.path.exists(expected):
             return expected
 
-        for p in self._filepaths_from_info(info):
-            if p and os.path.exists(p):
-                if p.lower().endswith(f".{ext}") or wants_m4a_passthrough and p.lower().endswith(".m4a"):
-                    return p
-        for p in self._filepaths_from_info(info):
-            if p and os.path.exists(p):
+        # Stat each path yt-dlp reported once; prefer the requested extension among them
+        existing = [p for p in dict.fromkeys(self._filepaths_from_info(info)) if p and os.path.exists(p)]
+        for p in existing:
+            if p.lower().endswith(f".{ext}") or wants_m4a_passthrough and p.lower().endswith(".m4a"):
                 return p
+        if existing:
+            return existing[0]
 
         try:
             fn = ydl.prepare_filename(info)
@@ -131,26 +266,25 @@ class YouTubeService:
             ".webm",
             ".wav",
         )
-        if os.path.isdir(d):
-            try:
-                # Prefer exact extension, then any known audio file with same stem (yt-dlp quirk).
-                candidates: List[str] = []
-                for name in os.listdir(d):
-                    low = name.lower()
-                    if not any(low.endswith(s) for s in audio_suffixes):
-                        continue
-                    full = os.path.join(d, name)
-                    if not os.path.isfile(full):
+        try:
+            # Prefer exact extension, then any known audio file with same stem (yt-dlp quirk).
+            # One scandir pass; DirEntry.is_file() uses the dirent type instead of a stat per file.
+            by_suffix: Dict[str, str] = {}
+            with os.scandir(d) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if stem not in name:
                         continue
-                    if not (name.startswith(stem) or stem in name):
+                    low = name.lower()
+                    suffix = next((s for s in audio_suffixes if low.endswith(s)), None)
+                    if suffix is None or suffix in by_suffix or not entry.is_file():
                         continue
-                    candidates.append(full)
-                for want in (f".{ext}", ".flac", ".mp3", ".m4a", ".opus", ".ogg", ".webm", ".wav"):
-                    for full in candidates:
-                        if full.lower().endswith(want):
-                            return full
-            except OSError:
-                pass
+                    by_suffix[suffix] = entry.path
+            for want in audio_suffixes:
+                if want in by_suffix:
+                    return by_suffix[want]
+        except OSError:
+            pass
         return None
 
     def _add_cookies_to_opts(self, ydl_opts: Dict) -> Dict:
@@ -163,75 +297,82 @@ class YouTubeService:
         return ydl_opts
     
     def calculate_similarity(self, str1: str, str2: str) -> float:
-        """Calculate similarity between two strings using SequenceMatcher."""
+        """Calculate similarity between two strings (normalized Indel ratio, 0..1)."""
         str1 = (str1 or "").lower().strip()
         str2 = (str2 or "").lower().strip()
-        return SequenceMatcher(None, str1, str2).ratio()
+        return Indel.normalized_similarity(str1, str2)
+
+    @staticmethod
+    def _similarity_prelower(a: str, b: str) -> float:
+        """calculate_similarity for normalize_text() output, which is already lowercased and stripped."""
+        return Indel.normalized_similarity(a, b)
 
     def normalize_text(self, s: str) -> str:
         """Normalize text for cross-source matching (best-effort, multilingual-safe)."""
-        s = (s or "").lower()
-
-        # unify separators
-        s = s.replace("–", " ").replace("—", " ").replace("-", " ").replace(":", " ")
-
-        # remove common meta tokens
-        meta_tokens = [
-            "official audio",
-            "official video",
-            "official music video",
-            "lyrics",
-            "lyric video",
-            "audio",
-            "mv",
-            "hd",
-            "4k",
-            "official",
-            "music video",
-        ]
-        for t in meta_tokens:
-            s = s.replace(t, " ")
-
-        # remove bracketed meta (best-effort)
-        s = re.sub(r"\((official|mv|music video|lyrics|lyric video|audio|hd|4k)[^)]*\)", " ", s)
-        s = re.sub(r"\[(official|mv|music video|lyrics|lyric video|audio|hd|4k)[^\]]*\]", " ", s)
+        return _normalize_text_cached(s or "")
 
-        # normalize feat tokens
-        s = re.sub(r"\b(feat\.|feat|ft\.|ft)\b", "feat", s)
+    def tokens(self, s: str) -> Tuple[str, ...]:
+        return _tokens_cached(s or "")
 
-        # collapse whitespace
-        s = re.sub(r"\s+", " ", s).strip()
-        return s
-
-    def tokens(self, s: str) -> List[str]:
-        s = self.normalize_text(s)
-        return [p for p in re.split(r"\s+", s) if p]
+    @staticmethod
+    def _tokens_norm(s_norm: str) -> List[str]:
+        """Tokens of an already normalize_text()'d string (no second normalization pass)."""
+        return s_norm.split()
 
     def title_score(self, spotify_title: str, yt_title: str) -> float:
         a = self.normalize_text(spotify_title)
-        b = self.normalize_text(yt_title)
+        return self._title_score_prepared(a, self._title_tokens(a), self.normalize_text(yt_title))
+
+    def _title_tokens(self, title_norm: str) -> List[str]:
+        return [t for t in self._tokens_norm(title_norm) if len(t) >= 2 and t != "feat"]
 
-        sim = self.calculate_similarity(a, b)
+    def _title_score_prepared(
+        self, a: str, ts: List[str], b: str, sims: Optional[Dict[str, float]] = None
+    ) -> float:
+        """title_score with both titles already normalized (a, b) and a tokenized (ts).
+
+        sims optionally maps normalized YouTube titles to a precomputed similarity with a.
+        """
+        if a == b:
+            return 1.0
+        # One containment check per candidate, reused for the exact ratio and the floor below
+        contained = bool(a) and a in b
+        if contained:
+            # Substring: the longest common subsequence is all of a, so the ratio is exact
+            sim = 2 * len(a) / (len(a) + len(b))
+        elif sims is not None and b in sims:
+            sim = sims[b]
+        else:
+            sim = self._similarity_prelower(a, b)
 
-        ts = [t for t in self.tokens(a) if len(t) >= 2 and t not in {"feat"}]
         if ts:
             hits = sum(1 for t in ts if t in b)
             contain = hits / len(ts)
             sim = max(sim, 0.55 * sim + 0.45 * contain)
 
-        if a and a in b:
+        if contained:
             sim = max(sim, 0.85)
 
         return max(0.0, min(sim, 1.0))
 
     def artist_score(self, spotify_artists: List[str], yt_artists_text: str, yt_title: str) -> Tuple[float, int]:
         """Score artist match against ANY Spotify artist. Returns (score, matched_count)."""
-        yt_blob = self.normalize_text(yt_artists_text) + " " + self.normalize_text(yt_title)
+        artist_norms = [self.normalize_text(a) for a in (spotify_artists or [])]
+        return self._artist_score_prepared(artist_norms, self._artist_blob(yt_artists_text, yt_title))
 
+    def _artist_score_prepared(
+        self,
+        artist_norms: List[str],
+        yt_blob: str,
+        sims: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> Tuple[float, int]:
         per: List[float] = []
-        for a in (spotify_artists or []):
-            a_norm = self.normalize_text(a)
-            sim = self.calculate_similarity(a_norm, yt_blob)
+        for a_norm in artist_norms:
+            hits = sims.get(a_norm) if sims is not None else None
+            if hits is not None and yt_blob in hits:
+                sim = hits[yt_blob]
+            else:
+                sim = self._similarity_prelower(a_norm, yt_blob)
             if a_norm and a_norm in yt_blob:
                 sim = max(sim, 0.95)
             per.append(max(0.0, min(sim, 1.0)))
@@ -250,18 +391,42 @@ class YouTubeService:
 
         return max(0.0, min(best + bonus, 1.0)), matched
 
+    def _artist_blob(self, yt_artists_text: str, yt_title: str) -> str:
+        return self._artist_blob_norm(self.normalize_text(yt_artists_text), self.normalize_text(yt_title))
+
+    @staticmethod
+    def _artist_blob_norm(channel_norm: str, title_norm: str) -> str:
+        # Stripped so batched and per-pair similarities agree when one side is empty
+        return (channel_norm + " " + title_norm).strip()
+
+    @staticmethod
+    def _batch_similarities(query: str, choices: List[str]) -> Dict[str, float]:
+        """calculate_similarity of query against every choice in one rapidfuzz call.
+
+        Inputs must already be normalized (lowercase, stripped), as normalize_text returns.
+        """
+        return {
+            choice: score
+            for choice, score, _idx in process.extract(
+                query, choices, scorer=Indel.normalized_similarity, processor=None, limit=None
+            )
+        }
+
     def parse_duration_to_seconds(self, duration_str: str) -> Optional[int]:
+        """Parse "M:SS" or "H:MM:SS" by colon position (no split list); None otherwise."""
         if not duration_str:
             return None
-        parts = duration_str.strip().split(":")
+        s = duration_str.strip()
+        c1 = s.find(":")
+        if c1 < 0:
+            return None
+        c2 = s.find(":", c1 + 1)
         try:
-            if len(parts) == 2:
-                return int(parts[0]) * 60 + int(parts[1])
-            if len(parts) == 3:
-                return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-        except Exception:
+            if c2 < 0:
+                return int(s[:c1]) * 60 + int(s[c1 + 1:])
+            return int(s[:c1]) * 3600 + int(s[c1 + 1:c2]) * 60 + int(s[c2 + 1:])
+        except ValueError:
             return None
-        return None
 
     def duration_score(self, spotify_duration_ms: Optional[int], yt_duration_seconds: Optional[int], yt_duration_str: str = "") -> float:
         """Score duration similarity. Accepts either parsed seconds or a duration string."""
@@ -276,33 +441,21 @@ class YouTubeService:
 
         sp_sec = max(1.0, spotify_duration_ms / 1000.0)
         delta = abs(sp_sec - float(yt_sec))
-
-        if delta <= 5:
-            return 1.0
-        if delta <= 15:
-            return 0.85
-        if delta <= 30:
-            return 0.65
-        if delta <= 60:
-            return 0.35
-        return 0.0
+        return _DURATION_SCORES[bisect_left(_DURATION_BREAKS, delta)]
 
     def rank_prior(self, rank: int, strength: float) -> float:
-        r = max(1, rank)
-        return math.exp(-(r - 1) / max(1e-6, strength))
+        return _rank_prior(rank, strength)
 
     def heuristic_adjustment(self, spotify_title: str, yt_title: str) -> float:
-        sp = self.normalize_text(spotify_title)
-        yt = self.normalize_text(yt_title)
+        return self._heuristic_prepared(self.normalize_text(spotify_title), self.normalize_text(yt_title))
 
+    def _heuristic_prepared(self, sp: str, yt: str) -> float:
         adj = 0.0
 
-        sp_live = any(k in sp for k in ["live", "现场", "現場"])
-        yt_live = any(k in yt for k in ["live", "现场", "現場"])
-        if sp_live and yt_live:
+        if _RE_LIVE.search(sp) and _RE_LIVE.search(yt):
             adj += 0.05
 
-        if ("cover" in yt or "翻唱" in yt) and ("cover" not in sp and "翻唱" not in sp):
+        if _RE_COVER.search(yt) and not _RE_COVER.search(sp):
             adj -= 0.12
 
         if "remix" in yt and "remix" not in sp:
@@ -326,6 +479,15 @@ class YouTubeService:
 
         Mirrors the scoring you validated in [`debug_ytmusic_scoring.py`](debug_ytmusic_scoring.py:1).
         """
+        prepared = self._prepare_catalog_side(track_name, artist, track_info)
+        title_norm = self.normalize_text(youtube_title)
+        blob = self._artist_blob_norm(self.normalize_text(youtube_channel), title_norm)
+        return self._score_with_prepared(
+            prepared, title_norm, blob, rank, source, yt_duration_seconds, yt_duration_str
+        )
+
+    def _prepare_catalog_side(self, track_name: str, artist: str, track_info: Optional[Dict]) -> Dict[str, Any]:
+        """Normalize the catalog track once; it is the same for every candidate of a search."""
         spotify_title = track_name
         spotify_artists = []
         spotify_duration_ms: Optional[int] = None
@@ -339,9 +501,30 @@ class YouTubeService:
         if not spotify_artists:
             spotify_artists = [a.strip() for a in (artist or "").split(",") if a.strip()]
 
-        t_s = self.title_score(spotify_title, youtube_title)
-        a_s, _matched = self.artist_score(spotify_artists, youtube_channel, youtube_title)
-        d_s = self.duration_score(spotify_duration_ms, yt_duration_seconds, yt_duration_str)
+        title_norm = self.normalize_text(spotify_title)
+        return {
+            "title_norm": title_norm,
+            "title_tokens": self._title_tokens(title_norm),
+            "artist_norms": [self.normalize_text(a) for a in spotify_artists],
+            "duration_ms": spotify_duration_ms,
+        }
+
+    def _score_with_prepared(
+        self,
+        prepared: Dict[str, Any],
+        yt_title_norm: str,
+        yt_blob: str,
+        rank: int = 1,
+        source: str = "ytmusic",
+        yt_duration_seconds: Optional[int] = None,
+        yt_duration_str: str = "",
+    ) -> float:
+        """Score one candidate from its normalized title and artist blob (see _artist_blob_norm)."""
+        t_s = self._title_score_prepared(
+            prepared["title_norm"], prepared["title_tokens"], yt_title_norm, prepared.get("title_sims")
+        )
+        a_s, _matched = self._artist_score_prepared(prepared["artist_norms"], yt_blob, prepared.get("artist_sims"))
+        d_s = self.duration_score(prepared["duration_ms"], yt_duration_seconds, yt_duration_str)
 
         # Trust YTMusic ordering more than a raw YouTube web search.
         rank_strength = DEFAULT_RANK_STRENGTH
@@ -349,16 +532,127 @@ class YouTubeService:
             rank_strength = max(3.0, DEFAULT_RANK_STRENGTH * 0.6)
         r_s = self.rank_prior(rank, rank_strength)
 
-        heur = self.heuristic_adjustment(spotify_title, youtube_title)
+        heur = self._heuristic_prepared(prepared["title_norm"], yt_title_norm)
 
         # Combine (same weights as debug script)
         final = (0.45 * t_s) + (0.25 * a_s) + (0.20 * d_s) + (0.10 * r_s) + heur
         final = max(0.0, min(final, 1.0))
         return final
     
+    def _ytm_search(self, query: str, limit: int) -> List[Dict]:
+        """YTMusic song search, cached so retries and repeated album tracks skip the HTTP call."""
+        key = make_key("ytm_search", query, limit)
+        cached = cache_get(key)
+        if cached is not None:
+            return cached["results"]
+        results = self.ytmusic.search(query, filter="songs", limit=limit) or []
+        cache_set(key, {"results": results})
+        return results
+
+    @staticmethod
+    def _ydl_query(track_name: str, artist: str, track_info: Optional[Dict]) -> str:
+        """Plain YouTube search query; the album name, when known, narrows the results."""
+        if track_info and track_info.get('album'):
+            return f"{artist} {track_name} {track_info.get('album')} official"
+        return f"{artist} {track_name} official audio"
+
+    def _ydl_search_opts(self, num_results: int) -> Dict:
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': True,
+            'default_search': f'ytsearch{num_results}',
+            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        }
+        return self._add_cookies_to_opts(ydl_opts)
+
+    def warm_up(self) -> None:
+        """Build the search YoutubeDL instances ahead of the first request.
+
+        The first YoutubeDL loads yt-dlp's extractor classes, which takes a noticeable
+        fraction of a second; the built instances are left idle in the pool. No network.
+        """
+        # num_results used by the candidates endpoint (default) and search_and_download
+        for num_results in (5, 3):
+            with self._pooled_ydl(self._ydl_search_opts(num_results)):
+                pass
+
+    def _ydl_search(self, query: str, num_results: int) -> List[Dict]:
+        """Flat yt-dlp search entries (cached like _ytm_search; errors propagate uncached)."""
+        key = make_key("ydl_search", query, num_results)
+        cached = cache_get(key)
+        if cached is not None:
+            return cached["entries"]
+
+        with self._pooled_ydl(self._ydl_search_opts(num_results)) as ydl:
+            info = ydl.extract_info(f"ytsearch{num_results}:{query}", download=False)
+
+        # Keep only the fields search_candidates reads; None entries keep their rank slot
+        fields = ('id', 'title', 'channel', 'uploader', 'duration', 'thumbnail')
+        entries = [
+            {k: e[k] for k in fields if k in e} if e else None
+            for e in (info or {}).get('entries') or []
+        ]
+        cache_set(key, {"entries": entries})
+        return entries
+
+    def _score_candidates(
+        self,
+        rows: List[Tuple[int, Optional[int], str, Dict]],
+        track_name: str,
+        artist: str,
+        track_info: Optional[Dict],
+    ) -> None:
+        """Set 'score' on each (rank, yt_seconds, yt_duration_str, candidate) row.
+
+        Runs after all network lookups so scoring is one tight pass over the results.
+        """
+        if not rows:
+            return
+        prepared = self._prepare_catalog_side(track_name, artist, track_info)
+        # Each candidate's title/channel is normalized once here and reused by every scorer
+        norms = []
+        for *_, c in rows:
+            title_norm = self.normalize_text(c['title'])
+            norms.append((title_norm, self._artist_blob_norm(self.normalize_text(c['channel']), title_norm)))
+        # Similarities of the catalog title/artists against every candidate, batched per query
+        title_norms = list({t for t, _ in norms})
+        blobs = list({b for _, b in norms})
+        prepared["title_sims"] = self._batch_similarities(prepared["title_norm"], title_norms)
+        prepared["artist_sims"] = {a: self._batch_similarities(a, blobs) for a in set(prepared["artist_norms"])}
+
+        for (rank, yt_seconds, yt_duration_str, candidate), (title_norm, blob) in zip(rows, norms):
+            score = self._score_with_prepared(
+                prepared,
+                title_norm,
+                blob,
+                rank=rank,
+                source=candidate['source'],
+                yt_duration_seconds=yt_seconds,
+                yt_duration_str=yt_duration_str,
+            )
+            candidate['score'] = round(score, 3)
+
     def search_candidates(self, track_name: str, artist: str, track_info: Dict = None, num_results: int = 5) -> Dict:
         """Search YouTube and return top candidates with confidence scores."""
+        ti = track_info or {}
+        cache_key = make_key(
+            "candidates",
+            track_name,
+            artist,
+            ti.get("album"),
+            ti.get("name"),
+            ti.get("artists"),
+            ti.get("duration_ms"),
+            num_results,
+        )
+        cached = cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         candidates = []
+        # (rank, yt seconds, yt duration string, candidate) -- scored together once collected
+        rows = []
         yt_dlp_blocked = False  # Track if yt-dlp was blocked
 
         # Try YTMusic first
@@ -368,7 +662,7 @@ class YouTubeService:
                 if track_info and track_info.get('album'):
                     search_query += f" {track_info.get('album')}"
 
-                results = self.ytmusic.search(search_query, filter="songs", limit=num_results)
+                results = self._ytm_search(search_query, num_results)
 
                 for idx, res in enumerate(results, start=1):
                     video_id = res.get('videoId')
@@ -380,98 +674,56 @@ class YouTubeService:
                     channel = ", ".join([a.get('name', '') for a in artists_list]) if artists_list else ''
 
                     duration_str = res.get('duration', '0:00')
-                    duration = 0
-                    try:
-                        parts = duration_str.split(':')
-                        if len(parts) == 2:
-                            duration = int(parts[0]) * 60 + int(parts[1])
-                        elif len(parts) == 3:
-                            duration = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-                    except Exception:
-                        duration = 0
+                    duration = self.parse_duration_to_seconds(duration_str) or 0
 
                     thumbnails = res.get('thumbnails', [])
                     thumbnail = thumbnails[-1].get('url', '') if thumbnails else ''
 
-                    score = self.calculate_match_score(
-                        title,
-                        channel,
-                        track_name,
-                        artist,
-                        track_info=track_info,
-                        rank=idx,
-                        source='ytmusic',
-                        yt_duration_seconds=duration,
-                        yt_duration_str=duration_str,
-                    )
-
-                    candidates.append({
+                    candidate = {
                         'video_id': video_id,
                         'title': title,
                         'channel': channel,
                         'duration': duration,
                         'thumbnail': thumbnail,
-                        'score': round(score, 3),
+                        'score': 0.0,
                         'url': f"https://music.youtube.com/watch?v={video_id}",
                         'source': 'ytmusic'
-                    })
+                    }
+                    candidates.append(candidate)
+                    rows.append((idx, duration, duration_str, candidate))
             except Exception as e:
                 print(f"YTMusic search failed: {e}")
 
-        # Fallback to yt-dlp if no candidates found or YTMusic failed
-        if not candidates:
-            if track_info and track_info.get('album'):
-                query = f"{artist} {track_name} {track_info.get('album')} official"
-            else:
-                query = f"{artist} {track_name} official audio"
-
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': True,
-                'default_search': f'ytsearch{num_results}',
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            }
-            ydl_opts = self._add_cookies_to_opts(ydl_opts)
+        self._score_candidates(rows, track_name, artist, track_info)
 
+        # Add yt-dlp results if YTMusic found nothing, failed, or only weak matches
+        if max((c['score'] for c in candidates), default=0.0) < CONFIDENCE_THRESHOLD:
+            seen = {c['video_id'] for c in candidates}
+            rows = []
             try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    search_query = f"ytsearch{num_results}:{query}"
-                    info = ydl.extract_info(search_query, download=False)
-
-                    if 'entries' in info and info['entries']:
-                        for idx, entry in enumerate(info['entries'], start=1):
-                            if not entry:
-                                continue
-
-                            title = entry.get('title', '')
-                            channel = entry.get('channel', entry.get('uploader', ''))
-                            video_id = entry.get('id', '')
-                            duration = entry.get('duration', 0)
-                            thumbnail = entry.get('thumbnail', '')
-
-                            score = self.calculate_match_score(
-                                title,
-                                channel,
-                                track_name,
-                                artist,
-                                track_info=track_info,
-                                rank=idx,
-                                source='yt-dlp',
-                                yt_duration_seconds=duration if isinstance(duration, int) else None,
-                                yt_duration_str="",
-                            )
-
-                            candidates.append({
-                                'video_id': video_id,
-                                'title': title,
-                                'channel': channel,
-                                'duration': duration,
-                                'thumbnail': thumbnail,
-                                'score': round(score, 3),
-                                'url': f"https://www.youtube.com/watch?v={video_id}",
-                                'source': 'yt-dlp'
-                            })
+                entries = self._ydl_search(self._ydl_query(track_name, artist, track_info), num_results)
+                for idx, entry in enumerate(entries, start=1):
+                    if not entry or entry.get('id', '') in seen:
+                        continue
+
+                    title = entry.get('title', '')
+                    channel = entry.get('channel', entry.get('uploader', ''))
+                    video_id = entry.get('id', '')
+                    duration = entry.get('duration', 0)
+                    thumbnail = entry.get('thumbnail', '')
+
+                    candidate = {
+                        'video_id': video_id,
+                        'title': title,
+                        'channel': channel,
+                        'duration': duration,
+                        'thumbnail': thumbnail,
+                        'score': 0.0,
+                        'url': f"https://www.youtube.com/watch?v={video_id}",
+                        'source': 'yt-dlp'
+                    }
+                    candidates.append(candidate)
+                    rows.append((idx, duration if isinstance(duration, int) else None, "", candidate))
             except Exception as e:
                 error_msg = str(e)
                 # Log the error but don't fail completely - we might have YTMusic candidates
@@ -482,10 +734,12 @@ class YouTubeService:
                     print(f"yt-dlp search failed: {e}")
                 # Continue with whatever candidates we have (from YTMusic if available)
 
-        # Sort by score descending
-        candidates.sort(key=lambda x: x['score'], reverse=True)
+            self._score_candidates(rows, track_name, artist, track_info)
+
+        # Top 3 by score, descending (same order and tie-breaking as a full stable sort)
+        top = heapq.nlargest(3, candidates, key=lambda x: x['score'])
         
-        if not candidates:
+        if not top:
             return {
                 'success': False,
                 'error': "No results found on YouTube or YouTube Music. YouTube may be blocking requests (403). Try using YouTube cookies (see documentation).",
@@ -493,14 +747,14 @@ class YouTubeService:
                 'needs_confirmation': False
             }
 
-        best_score = candidates[0]['score']
+        best_score = top[0]['score']
         # Only show confirmation if confidence is really low
         # Disable aggressive confirmation for now - let it work normally
         needs_confirmation = best_score < CONFIDENCE_THRESHOLD
         
         result = {
             'success': True,
-            'candidates': candidates[:3],
+            'candidates': top,
             'best_score': best_score,
             'needs_confirmation': needs_confirmation,
             'threshold': CONFIDENCE_THRESHOLD
@@ -508,16 +762,33 @@ class YouTubeService:
         # Add warning if yt-dlp was blocked
         if yt_dlp_blocked:
             result['warning'] = 'YouTube blocked some requests (403). Consider configuring YouTube cookies for better reliability.'
+        else:
+            cache_set(cache_key, result)
         return result
     
-    def download_by_video_id(self, video_id: str, output_path: str, output_format: str = None, audio_quality: str = None) -> Dict:
-        """Download a specific YouTube video by ID"""
+    def download_by_video_id(self, video_id: str, output_path: str, output_format: str = None, audio_quality: str = None, overwrite: bool = False) -> Dict:
+        """Download a specific YouTube video by ID.
+
+        Unless overwrite is set, a complete audio file already at the target path (e.g. left by
+        an earlier attempt whose later steps failed) is returned without running yt-dlp again.
+        """
         output_format = (output_format or self.output_format or "mp3").strip().lower()
         audio_quality = audio_quality or self.audio_quality
 
         output_path = os.path.abspath(output_path)
         base_path = self._output_base_path(output_path, output_format)
 
+        expected = f"{base_path}.{output_format}"
+        if not overwrite and self._is_complete_audio(expected):
+            return {
+                'success': True,
+                'file_path': expected,
+                'title': '',
+                'duration': 0,
+                'url': f"https://www.youtube.com/watch?v={video_id}",
+            }
+        expected_before = self._file_signature(expected)
+
         # If the user wants m4a and YouTube provides it as itag 140 (m4a/aac),
         # keep the original container by skipping FFmpegExtractAudio.
         wants_m4a_passthrough = (output_format or "").lower() == "m4a"
@@ -525,7 +796,7 @@ class YouTubeService:
         ydl_opts = {
             # Avoid HLS (m3u8) formats that get blocked - prefer direct audio formats
             # Format priority: m4a direct > opus/webm direct > bestaudio (non-HLS) > fallback
-            'format': 'bestaudio[ext=m4a][protocol!=m3u8]/bestaudio[ext=webm][protocol!=m3u8]/bestaudio[ext=opus][protocol!=m3u8]/bestaudio[protocol!=m3u8]/best[ext=m4a][protocol!=m3u8]/best[ext=webm][protocol!=m3u8]/best[height<=720][protocol!=m3u8]/best',
+            'format': self._format_selector(output_format),
             'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             # Try different YouTube clients as fallback (helps with 403 errors)
             'extractor_args': {
@@ -536,7 +807,6 @@ class YouTubeService:
             'retries': 10,
             'fragment_retries': 10,
             'file_access_retries': 3,
-            'outtmpl': self._yt_dlp_outtmpl(base_path),
             'fixup': 'never',
             'quiet': False,
             'no_warnings': False,
@@ -571,7 +841,9 @@ class YouTubeService:
                 'nopostoverwrites': False,
             }]
             # Extra ffmpeg flags can interfere with lossless encoders; keep stereo resample for lossy only.
-            if output_format not in ('flac', 'wav', 'alac'):
+            # Opus is usually a stream copy of the source (see _format_selector), which ffmpeg
+            # cannot filter, and libopus resamples to 48 kHz regardless.
+            if output_format not in ('flac', 'wav', 'alac', 'opus'):
                 ydl_opts['postprocessor_args'] = {
                     'ffmpeg': [
                         '-af', 'aresample=44100',
@@ -582,7 +854,7 @@ class YouTubeService:
         ydl_opts = self._add_cookies_to_opts(ydl_opts)
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with self._pooled_ydl(ydl_opts, outtmpl=self._yt_dlp_outtmpl(base_path)) as ydl:
                 url = f"https://www.youtube.com/watch?v={video_id}"
                 info = ydl.extract_info(url, download=True)
 
@@ -602,6 +874,13 @@ class YouTubeService:
                 }
 
         except Exception as e:
+            # FFmpegExtractAudio writes straight to the final name when the extension changes,
+            # so a failed encode can leave a truncated file there; never let a retry reuse it
+            if self._file_signature(expected) not in (None, expected_before):
+                try:
+                    os.remove(expected)
+                except OSError:
+                    pass
             error_msg = str(e)
             if '403' in error_msg or 'Forbidden' in error_msg:
                 error_msg = "YouTube blocked the request (HTTP 403). Try again in a few minutes."
@@ -615,14 +894,16 @@ class YouTubeService:
         output_format = (output_format or self.output_format or "mp3").strip().lower()
         audio_quality = audio_quality or self.audio_quality
 
-        # If a specific video_id is provided, download it directly
+        # If a specific video_id is provided, download it directly. The user picked this video,
+        # so it replaces whatever an earlier automatic match left at the same path.
         if video_id:
-            return self.download_by_video_id(video_id, output_path, output_format, audio_quality)
+            return self.download_by_video_id(video_id, output_path, output_format, audio_quality, overwrite=True)
         
         # Try to find the best candidate using our search logic (YTMusic with yt-dlp fallback)
         # This ensures album downloads and auto-downloads use the best available source
+        num_results = 3
         try:
-            search_result = self.search_candidates(track_name, artist, track_info, num_results=3)
+            search_result = self.search_candidates(track_name, artist, track_info, num_results=num_results)
             if search_result.get('success') and search_result.get('candidates'):
                 best_candidate = search_result['candidates'][0]
                 # Auto-select if we have high confidence match
@@ -632,153 +913,43 @@ class YouTubeService:
         except Exception as e:
             print(f"Pre-download search failed: {e}")
 
-        # Fallback to original yt-dlp search and download logic if no high-confidence candidate found
-        # Create more specific search query to get better matches
-        # Include album name if available for better matching
-        if track_info and track_info.get('album'):
-            query = f"{artist} {track_name} {track_info.get('album')} official"
-        else:
-            query = f"{artist} {track_name} official audio"
-        
-        # Convert to absolute path to avoid filesystem issues
-        output_path = os.path.abspath(output_path)
-        base_path = self._output_base_path(output_path, output_format)
-        
-        # If the user wants m4a and YouTube provides it as itag 140 (m4a/aac),
-        # keep the original container by skipping FFmpegExtractAudio.
-        wants_m4a_passthrough = (output_format or '').lower() == 'm4a'
-
-        ydl_opts = {
-            # Avoid HLS (m3u8) formats that get blocked - prefer direct audio formats
-            'format': 'bestaudio[ext=m4a][protocol!=m3u8]/bestaudio[ext=webm][protocol!=m3u8]/bestaudio[ext=opus][protocol!=m3u8]/bestaudio[protocol!=m3u8]/best[ext=m4a][protocol!=m3u8]/best[ext=webm][protocol!=m3u8]/best[height<=720][protocol!=m3u8]/best',
-            # Robust user agent to avoid 403 errors
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            # Try different YouTube clients as fallback (helps with 403 errors)
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['tv_embedded'],  # Try multiple clients
-                }
-            },
-            # Retry configuration for network issues and 403 errors
-            'retries': 10,
-            'fragment_retries': 10,
-            'file_access_retries': 3,
-            'outtmpl': self._yt_dlp_outtmpl(base_path),
-            'fixup': 'never',  # Skip FixupM4a which causes filesystem errors
-            'quiet': False,
-            'no_warnings': False,
-            'default_search': 'ytsearch1',  # Search and get first result
-            'noplaylist': True,
-            'extract_flat': False,
-            'writesubtitles': False,
-            'writeautomaticsub': False,
-        }
-
-        # Always add the FFmpegExtractAudio postprocessor when output is m4a
-        # This ensures we get a proper .m4a file even if source was Opus/webm
-        if wants_m4a_passthrough:
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'm4a',
-                # 'preferredquality': '256',
-                'nopostoverwrites': False,
-            }]
-            ydl_opts['postprocessor_args'] = {
-                'ffmpeg': [
-                    # '-af', 'aresample=44100',
-                    '-ac', '2',
-                    '-c:a', 'copy',
-                    '-q:a', '0',
-                ]
-            }
-        else:
-            pq = self._preferred_quality_for_extract(output_format, audio_quality)
-            preferredcodec = self._ffmpeg_extract_preferredcodec(output_format)
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': preferredcodec,
-                'preferredquality': pq,
-                'nopostoverwrites': False,
-            }]
-            if output_format not in ('flac', 'wav', 'alac'):
-                ydl_opts['postprocessor_args'] = {
-                    'ffmpeg': [
-                        '-af', 'aresample=44100',
-                        '-ac', '2',
-                    ]
-                }
-
-        ydl_opts = self._add_cookies_to_opts(ydl_opts)
-
+        # No high-confidence candidate: take the top plain YouTube hit for the same query.
+        # search_candidates already ran this flat search (served from cache here), so only
+        # the chosen video is resolved and downloaded.
+        query = self._ydl_query(track_name, artist, track_info)
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Search and download in one step (faster)
-                search_query = f"ytsearch1:{query}"
-                download_info = ydl.extract_info(search_query, download=True)
-
-                meta = download_info
-                # Extract actual video info from ytsearch result (it returns entries)
-                if download_info.get('entries'):
-                    video_entry = download_info['entries'][0]
-                    if video_entry:
-                        # Validate the match after download
-                        youtube_title = (video_entry.get('title') or download_info.get('title') or '').lower()
-                        youtube_uploader = (video_entry.get('uploader') or download_info.get('uploader') or '').lower()
-
-                        track_name_lower = track_name.lower()
-                        artist_parts = [a.strip().lower() for a in artist.lower().split(',')]
-                        main_artist = artist_parts[0] if artist_parts else ''
-
-                        # Check if title contains key words from track name
-                        track_words = [w for w in track_name_lower.split() if len(w) > 2]
-                        title_match = track_name_lower in youtube_title or any(word in youtube_title for word in track_words)
-                        artist_match = main_artist in youtube_title or main_artist in youtube_uploader
-
-                        # Log for debugging (non-blocking)
-                        print(f"YouTube result: '{video_entry.get('title') or download_info.get('title')}' by '{video_entry.get('uploader') or download_info.get('uploader')}'")
-                        print(f"Looking for: '{track_name}' by '{artist}' - Match: title={title_match}, artist={artist_match}")
-
-                        if video_entry.get('title'):
-                            meta = video_entry
-
-                actual_path = self._resolve_downloaded_audio(
-                    base_path, output_format, wants_m4a_passthrough, download_info, ydl
-                )
-                if not actual_path:
-                    exp = f"{base_path}.m4a" if wants_m4a_passthrough else f"{base_path}.{output_format}"
-                    raise FileNotFoundError(f"Downloaded file not found. Expected: {exp}")
-
-                return {
-                    'success': True,
-                    'file_path': actual_path,
-                    'title': meta.get('title', track_name),
-                    'duration': meta.get('duration', 0),
-                    'url': meta.get('webpage_url', ''),
-                }
-        
+            entries = self._ydl_search(query, num_results)
         except Exception as e:
             error_msg = str(e)
-            
+
             # Provide helpful error messages for common issues
             if '403' in error_msg or 'Forbidden' in error_msg:
                 error_msg = "YouTube blocked the request (HTTP 403). This can happen due to rate limiting, IP blocking, or YouTube's anti-bot measures. Try again in a few minutes, or ensure yt-dlp is up to date: pip install --upgrade yt-dlp"
             elif 'HTTP Error' in error_msg:
                 error_msg = f"Network error: {error_msg}. Check your internet connection and try again."
-            elif 'unable to download video data' in error_msg.lower():
-                error_msg = f"YouTube download failed: {error_msg}. This may be due to the video being unavailable, region-locked, or YouTube blocking the request. Try a different track or wait a few minutes."
-            
-            print(f"YouTube download error: {e}")
+
+            print(f"YouTube search error: {e}")
             return {
                 'success': False,
                 'error': error_msg
             }
-    
+
+        top = next((e for e in entries if e and e.get('id')), None)
+        if top is None:
+            return {
+                'success': False,
+                'error': f"No YouTube results found for '{track_name}' by '{artist}'."
+            }
+
+        print(f"YouTube result: '{top.get('title')}' by '{top.get('channel') or top.get('uploader')}'")
+        return self.download_by_video_id(top['id'], output_path, output_format, audio_quality)
+
     def sanitize_filename(self, filename: str) -> str:
         """Remove invalid characters from filename"""
         # Remove invalid characters
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+        filename = _RE_FILENAME_BAD.sub('', filename)
         # Replace multiple spaces with single space
-        filename = re.sub(r'\s+', ' ', filename)
+        filename = _RE_WS.sub(' ', filename)
         # Trim
         filename = filename.strip()
         return filename
@@ -804,11 +975,16 @@ class YouTubeService:
 
         # Build a canonical URL if a bare ID was provided
         url = url_or_id
-        if re.fullmatch(r"[A-Za-z0-9_-]{11}", (url_or_id or "")):
+        if _RE_VIDEO_ID.fullmatch(url_or_id or ""):
             url = f"https://www.youtube.com/watch?v={url_or_id}"
 
+        cache_key = make_key("info", (url or "").strip())
+        cached = cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with self._pooled_ydl(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=False)
 
             thumbnails = info.get('thumbnails') or []
@@ -819,7 +995,7 @@ class YouTubeService:
             if not thumb_url:
                 thumb_url = info.get('thumbnail') or ''
 
-            return {
+            result = {
                 'success': True,
                 'video_id': info.get('id') or '',
                 'title': info.get('title') or '',
@@ -828,6 +1004,8 @@ class YouTubeService:
                 'webpage_url': info.get('webpage_url') or url,
                 'thumbnail': thumb_url,
             }
+            cache_set(cache_key, result, ttl_sec=config.YOUTUBE_VIDEO_INFO_CACHE_TTL_SEC)
+            return result
         except Exception as e:
             return {
                 'success': False,
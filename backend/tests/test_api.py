@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -54,3 +56,79 @@ def test_search_invalid_provider(client: TestClient) -> None:
     )
     assert r.status_code == 400
     assert "provider" in r.json()["detail"].lower()
+
+
+def test_download_file_serves_completed_job(client: TestClient, tmp_path) -> None:
+    from utils.job_store import upsert_job
+
+    audio = tmp_path / "Artist - Song.mp3"
+    audio.write_bytes(b"ID3" + b"\x00" * 3_000_000)
+    upsert_job("file-test", status="completed", message="done", file_path=str(audio))
+    r = client.get("/api/download/file/file-test", params={"filename": audio.name})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "audio/mpeg"
+    assert r.content == audio.read_bytes()
+
+
+def test_download_file_missing_file(client: TestClient, tmp_path) -> None:
+    from utils.job_store import upsert_job
+
+    upsert_job("file-gone", status="completed", message="done", file_path=str(tmp_path / "gone.mp3"))
+    r = client.get("/api/download/file/file-gone", params={"filename": "gone.mp3"})
+    assert r.status_code == 404
+
+
+def test_cache_clear(client: TestClient) -> None:
+    r = client.post("/api/cache/clear")
+    assert r.status_code == 200
+    assert r.json()["status"] == "cleared"
+
+
+@pytest.mark.parametrize("in_temp_dir", [True, False])
+def test_download_file_cleans_up_only_temp_dir_files(
+    client: TestClient, tmp_path, monkeypatch, in_temp_dir: bool
+) -> None:
+    import app as app_module
+    from utils.job_store import upsert_job
+
+    folder = app_module.TEMP_DIR if in_temp_dir else tmp_path / "stemp" / "temp"
+    folder.mkdir(parents=True, exist_ok=True)
+    audio = folder / f"cleanup-{in_temp_dir}.mp3"
+    audio.write_bytes(b"ID3")
+    cleaned = []
+    monkeypatch.setattr(app_module, "cleanup_temp_file", lambda path, _job: cleaned.append(path))
+    upsert_job("cleanup-test", status="completed", message="done", file_path=str(audio))
+    r = client.get("/api/download/file/cleanup-test", params={"filename": audio.name})
+    assert r.status_code == 200
+    assert cleaned == ([str(audio)] if in_temp_dir else [])
+
+
+def test_download_file_etag_not_modified(client: TestClient, tmp_path) -> None:
+    from utils.job_store import upsert_job
+
+    audio = tmp_path / "Etag - Song.mp3"
+    audio.write_bytes(b"ID3" * 100)
+    upsert_job("etag-test", status="completed", message="done", file_path=str(audio))
+    params = {"filename": audio.name}
+    first = client.get("/api/download/file/etag-test", params=params)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    again = client.get("/api/download/file/etag-test", params=params, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_prime_album_track_cache_skips_providers_without_bulk_lookup(monkeypatch) -> None:
+    import app as app_module
+    from utils.track_cache import clear_track_cache, get_cached_track
+
+    clear_track_cache()
+    album = {"artist": "Various Artists", "tracks": [{"id": "7", "artist": "Solo", "track_number": 3}]}
+    app_module.prime_album_track_cache("deezer", album)
+    assert get_cached_track("deezer", "7") is None
+
+    bulk = lambda ids: {i: {"id": i, "artist": "Solo", "album_artist": "Solo"} for i in ids}
+    monkeypatch.setattr(app_module, "spotify_service", SimpleNamespace(get_tracks_bulk=bulk))
+    app_module.prime_album_track_cache("spotify", album)
+    assert get_cached_track("spotify", "7")["album_artist"] == "Solo"
+    clear_track_cache()
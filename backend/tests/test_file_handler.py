@@ -0,0 +1,83 @@
+"""Unit tests for file helpers (local filesystem only)."""
+
+from __future__ import annotations
+
+import errno
+import os
+
+import pytest
+
+from utils import file_handler
+from utils.file_handler import fast_move
+
+
+def test_fast_move_same_filesystem(tmp_path) -> None:
+    src = tmp_path / "a.mp3"
+    dst = tmp_path / "lib" / "b.mp3"
+    dst.parent.mkdir()
+    src.write_bytes(b"abc" * 1000)
+    fast_move(str(src), str(dst))
+    assert not src.exists()
+    assert dst.read_bytes() == b"abc" * 1000
+
+
+def test_fast_move_cross_device_fallback(tmp_path, monkeypatch) -> None:
+    def exdev(_src, _dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(file_handler.os, "replace", exdev)
+    src = tmp_path / "a.flac"
+    dst = tmp_path / "b.flac"
+    data = os.urandom(3 * file_handler.COPY_BUFFER_SIZE + 17)
+    src.write_bytes(data)
+    os.utime(src, ns=(1_000_000_000, 1_000_000_000))
+    fast_move(str(src), str(dst), preserve_mtime=True)
+    assert not src.exists()
+    assert dst.read_bytes() == data
+    assert dst.stat().st_mtime_ns == 1_000_000_000
+
+
+def test_fast_move_missing_source_raises(tmp_path) -> None:
+    with pytest.raises(FileNotFoundError):
+        fast_move(str(tmp_path / "nope.mp3"), str(tmp_path / "x.mp3"))
+
+
+def test_copy_strategies_end_with_portable_loop() -> None:
+    assert file_handler._COPY_STRATEGIES[-1] is file_handler._copy_fd_readinto
+
+
+def test_fast_move_falls_back_when_fast_strategies_fail(tmp_path, monkeypatch) -> None:
+    def exdev(_src, _dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    def unsupported(_fd_in, _fd_out):
+        raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    monkeypatch.setattr(file_handler.os, "replace", exdev)
+    monkeypatch.setattr(
+        file_handler,
+        "_COPY_STRATEGIES",
+        (unsupported, file_handler._copy_fd_readinto),
+    )
+    src = tmp_path / "a.mp3"
+    dst = tmp_path / "b.mp3"
+    src.write_bytes(b"xyz" * 5000)
+    fast_move(str(src), str(dst))
+    assert dst.read_bytes() == b"xyz" * 5000
+    assert not src.exists()
+
+
+def test_get_download_path_sanitizes(tmp_path) -> None:
+    path = file_handler.get_download_path(
+        {"artist": "AC/DC", "name": 'What?  "Now"'}, str(tmp_path / "dl"), "flac"
+    )
+    assert path == os.path.join(str(tmp_path / "dl"), "ACDC - What Now.flac")
+    assert (tmp_path / "dl").is_dir()
+
+
+def test_get_download_path_recreates_removed_base_dir(tmp_path) -> None:
+    base = tmp_path / "staging"
+    file_handler.get_download_path({"artist": "A", "name": "B"}, str(base))
+    base.rmdir()
+    file_handler.get_download_path({"artist": "A", "name": "B"}, str(base))
+    assert base.is_dir()
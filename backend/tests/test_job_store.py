@@ -0,0 +1,156 @@
+"""Tests for the SQLite job store (uses the per-session temp DOWNLOAD_DIR from conftest)."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import job_store
+from utils.job_store import get_album_aggregate, get_job, init_jobs_db, upsert_job
+
+
+@pytest.fixture(autouse=True)
+def _db() -> None:
+    init_jobs_db()
+
+
+def test_upsert_then_get_job() -> None:
+    upsert_job("t-1", status="queued", message="queued", progress=0, payload={"a": 1})
+    upsert_job("t-1", status="processing", message="working", stage="downloading")
+    job = get_job("t-1", with_payload=True)
+    assert job["status"] == "processing"
+    assert job["stage"] == "downloading"
+    assert job["progress"] == 0
+    assert job["payload"] == {"a": 1}
+    assert "payload" not in get_job("t-1")
+
+
+def test_write_rolls_back_on_error() -> None:
+    with pytest.raises(RuntimeError):
+        with job_store.get_write_conn() as conn:
+            conn.execute(
+                "INSERT INTO completed_track_downloads (track_id, provider, completed_at_ms) VALUES (?, ?, ?)",
+                ("rollback", "deezer", 1),
+            )
+            raise RuntimeError("boom")
+    assert not job_store.has_completed_download("rollback", "deezer")
+
+
+def test_write_error_survives_transaction_already_rolled_back() -> None:
+    with pytest.raises(RuntimeError, match="boom"):
+        with job_store.get_write_conn() as conn:
+            conn.execute("ROLLBACK")
+            raise RuntimeError("boom")
+    with job_store.get_write_conn() as conn:
+        assert conn.in_transaction
+
+
+def test_concurrent_writes_and_reads() -> None:
+    def work(i: int) -> None:
+        upsert_job(f"c-{i}", status="completed", message="done", album_id="alb-c")
+        get_album_aggregate("alb-c")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, range(40)))
+
+    agg = get_album_aggregate("alb-c")
+    assert agg["total_tracks"] == 40
+    assert agg["completed_tracks"] == 40
+
+
+def test_debounced_updates_are_merged_and_flushed() -> None:
+    upsert_job("d-1", status="queued", message="queued", progress=0)
+    job_store.upsert_job_debounced("d-1", status="processing", message="a", stage="fetching", progress=10)
+    job_store.upsert_job_debounced("d-1", status="processing", message="b", progress=30)
+    assert job_store.flush_pending_jobs() == 1
+    job = get_job("d-1")
+    assert (job["message"], job["stage"], job["progress"]) == ("b", "fetching", 30)
+
+
+def test_terminal_upsert_supersedes_buffered_update() -> None:
+    job_store.upsert_job_debounced("d-2", status="processing", message="tagging", stage="tagging", progress=85)
+    upsert_job("d-2", status="completed", message="done", progress=100)
+    job_store.flush_pending_jobs()
+    job = get_job("d-2")
+    assert job["status"] == "completed"
+    assert job["stage"] == "tagging"
+
+
+def test_failed_flush_keeps_buffered_updates(monkeypatch) -> None:
+    upsert_job("d-3", status="queued", message="queued", progress=0)
+    job_store.upsert_job_debounced("d-3", status="processing", message="downloading", progress=40)
+    with monkeypatch.context() as m:
+        m.setattr(job_store, "_UPSERT_JOB_SQL", "INSERT INTO no_such_table VALUES (?)")
+        with pytest.raises(Exception):
+            job_store.flush_pending_jobs()
+    assert job_store.flush_pending_jobs() == 1
+    assert get_job("d-3")["progress"] == 40
+
+
+def test_album_aggregate_counts_and_current_track() -> None:
+    upsert_job("album:agg", status="queued", message="album", album_id="agg")
+    upsert_job("agg-1", status="completed", message="done", album_id="agg")
+    upsert_job("agg-2", status="error", message="failed", album_id="agg")
+    upsert_job("agg-3", status="processing", message="working", album_id="agg")
+    agg = get_album_aggregate("agg", exclude_job_id="album:agg")
+    assert agg == {
+        "status": "downloading",
+        "total_tracks": 3,
+        "completed_tracks": 1,
+        "failed_tracks": 1,
+        "current_track": "agg-3",
+    }
+    assert get_album_aggregate("missing")["total_tracks"] == 0
+
+
+def test_upsert_jobs_many_writes_all_and_absorbs_buffered_updates() -> None:
+    job_store.upsert_job_debounced("m-1", status="processing", message="old", stage="fetching")
+    job_store.upsert_jobs_many([
+        (f"m-{i}", {"status": "queued", "message": "queued", "progress": 0, "album_id": "alb-m"})
+        for i in range(1, 4)
+    ])
+    assert job_store.flush_pending_jobs() == 0
+    agg = get_album_aggregate("alb-m")
+    assert agg["total_tracks"] == 3
+    job = get_job("m-1")
+    assert (job["status"], job["stage"]) == ("queued", "fetching")
+
+
+def test_album_queries_use_covering_index_without_sort() -> None:
+    with job_store.get_read_conn() as conn:
+        plan = " ".join(
+            r["detail"]
+            for r in conn.execute(
+                "EXPLAIN QUERY PLAN " + job_store._ALBUM_AGGREGATE_SQL, {"album_id": "a", "exclude": "b"}
+            )
+        )
+        track_plan = " ".join(
+            r["detail"]
+            for r in conn.execute("EXPLAIN QUERY PLAN " + job_store._ALBUM_TRACK_JOBS_EXCLUDING_SQL, ("a", "b"))
+        )
+    assert "COVERING INDEX idx_download_jobs_album_updated" in plan
+    assert "TEMP B-TREE" not in plan + track_plan
+
+
+def test_read_connections_are_memory_mapped() -> None:
+    with job_store.get_read_conn() as conn:
+        assert conn.execute("PRAGMA mmap_size").fetchone()[0] > 0
+
+
+def test_album_track_jobs_are_job_summaries_newest_first() -> None:
+    upsert_job("s-1", status="completed", message="done", album_id="alb-s")
+    upsert_job("s-2", status="processing", message="working", album_id="alb-s", progress=40)
+    upsert_job("s-album", status="queued", message="album", album_id="alb-s")
+    jobs = job_store.get_album_track_jobs("alb-s", exclude_job_id="s-album")
+    assert {j.job_id for j in jobs} == {"s-1", "s-2"}
+    assert all(isinstance(j, job_store.JobSummary) for j in jobs)
+    assert [j.updated_at_ms for j in jobs] == sorted((j.updated_at_ms for j in jobs), reverse=True)
+    assert next(j for j in jobs if j.job_id == "s-2")._asdict()["progress"] == 40
+
+
+def test_init_records_schema_version() -> None:
+    with job_store.get_read_conn() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == job_store.SCHEMA_VERSION
+        cols = {r["name"] for r in conn.execute("PRAGMA table_info(download_jobs)")}
+    assert "album_id" in cols
@@ -0,0 +1,123 @@
+"""Unit tests for MetadataService helpers (no network)."""
+
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+from mutagen.id3 import TYER
+
+from services import metadata
+from services.metadata import MetadataService
+
+
+def _fake_response(body: bytes, headers: dict | None = None) -> MagicMock:
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.headers = {"Content-Type": "image/jpeg", **(headers or {})}
+    resp.iter_content.return_value = [body]
+    resp.__enter__.return_value = resp
+    return resp
+
+
+def test_album_art_fetched_once_per_url() -> None:
+    svc = MetadataService()
+    svc._session = MagicMock()
+    svc._session.get.return_value = _fake_response(b"jpeg")
+    assert svc._download_album_art("https://img/cover.jpg") == b"jpeg"
+    assert svc._download_album_art("https://img/cover.jpg#x") == b"jpeg"
+    assert svc._session.get.call_count == 1
+
+
+def test_album_art_cache_evicts_by_bytes(monkeypatch) -> None:
+    monkeypatch.setattr(metadata, "ART_CACHE_MAX_BYTES", 10)
+    svc = MetadataService()
+    svc._cache_album_art("a", b"123456")
+    svc._cache_album_art("b", b"123456")
+    assert svc._cached_album_art("a") is None
+    assert svc._cached_album_art("b") == b"123456"
+    assert svc._art_cache_bytes == 6
+
+
+def test_prefetch_album_art_dedupes_urls() -> None:
+    svc = MetadataService()
+    svc._session = MagicMock()
+    svc._session.get.return_value = _fake_response(b"art")
+    tracks = [{"album_art": "https://img/a.jpg"}] * 5 + [{"album_art": None}]
+    assert svc.prefetch_album_art(tracks) == {"https://img/a.jpg": b"art"}
+    assert svc._session.get.call_count == 1
+
+
+def test_apply_metadata_unsupported_extension(tmp_path) -> None:
+    f = tmp_path / "dir.with.dot" / "track"
+    assert MetadataService().apply_metadata(str(f), {}) is False
+    assert MetadataService().apply_metadata(str(tmp_path / "a.opus"), {}) is False
+
+
+def test_album_art_rejects_oversize_and_non_images(monkeypatch) -> None:
+    monkeypatch.setattr(metadata.config, "MAX_ART_BYTES", 4)
+    svc = MetadataService()
+    svc._session = MagicMock()
+    svc._session.get.return_value = _fake_response(b"12345")
+    assert svc._download_album_art("https://img/big.jpg") is None
+    svc._session.get.return_value = _fake_response(b"<html>", {"Content-Type": "text/html"})
+    assert svc._download_album_art("https://img/error.jpg") is None
+
+
+def _write_empty_flac(path) -> None:
+    # fLaC marker + a last-block STREAMINFO (44.1 kHz, 2ch, 16 bit); enough for mutagen
+    streaminfo = bytes(10) + bytes([0x0A, 0xC4, 0x40, 0xF0]) + bytes(20)
+    path.write_bytes(b"fLaC" + bytes([0x80, 0, 0, 34]) + streaminfo)
+
+
+def test_retag_with_identical_metadata_skips_save(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "song.flac"
+    _write_empty_flac(path)
+    svc = MetadataService()
+    svc._session = MagicMock()
+    svc._session.get.return_value = _fake_response(b"jpeg")
+    info = {"name": "Song", "artist": "A", "album": "B", "track_number": 2,
+            "release_date": "2020-01-01", "album_art": "https://img/c.jpg"}
+    assert svc.apply_metadata(str(path), dict(info))
+
+    saves = []
+    original_save = metadata.FLAC.save
+    monkeypatch.setattr(metadata.FLAC, "save", lambda self, *a, **k: saves.append(1) or original_save(self, *a, **k))
+    assert svc.apply_metadata(str(path), dict(info))
+    assert saves == []
+    assert svc.apply_metadata(str(path), {**info, "name": "Other"})
+    assert saves == [1]
+    assert len(metadata.FLAC(str(path)).pictures) == 1
+
+
+def test_norm_artists_joins_and_picks_first() -> None:
+    assert metadata._norm_artists("A, B;C") == ("A; B;C", "A")
+    assert metadata._norm_artists("") == ("", "")
+
+
+def test_mp3_tags_written_with_padding(tmp_path) -> None:
+    path = tmp_path / "song.mp3"
+    audio_bytes = b"\xff\xfb\x90\x00" * 256
+    path.write_bytes(audio_bytes)
+    svc = MetadataService()
+    assert svc.apply_metadata(str(path), {"name": "Song", "artist": "A, B", "album_artist": "A, B"})
+    tags = metadata.ID3(str(path))
+    assert tags["TIT2"].text == ["Song"]
+    assert tags["TPE1"].text == ["A; B"]
+    assert tags["TPE2"].text == ["A"]
+    data = path.read_bytes()
+    assert data.endswith(audio_bytes)
+    assert data.count(b"\x00" * metadata.ID3_PADDING) >= 1
+
+
+def test_mp3_v23_frames_upgraded_on_save(tmp_path) -> None:
+    path = tmp_path / "old.mp3"
+    path.write_bytes(b"\xff\xfb\x90\x00" * 256)
+    old = metadata.ID3()
+    old.add(metadata.TIT2(encoding=3, text="Old"))
+    old.add(TYER(encoding=3, text="2001"))
+    old.save(str(path), v2_version=3)
+    assert MetadataService().apply_metadata(str(path), {"name": "Song"})
+    tags = metadata.ID3(str(path), translate=False)
+    assert tags.version == (2, 4, 0)
+    assert "TYER" not in tags
+    assert str(tags["TDRC"].text[0]) == "2001"
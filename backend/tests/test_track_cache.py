@@ -0,0 +1,39 @@
+"""Unit tests for the in-memory catalog track cache."""
+
+from __future__ import annotations
+
+from utils import track_cache
+from utils.track_cache import clear_track_cache, get_cached_track, put_cached_track
+
+
+def test_put_and_get_returns_copy() -> None:
+    clear_track_cache()
+    put_cached_track("deezer", "1", {"id": "1", "artist": "A, B"})
+    got = get_cached_track("deezer", "1")
+    assert got == {"id": "1", "artist": "A, B"}
+    got["artist"] = "A; B"
+    assert get_cached_track("deezer", "1")["artist"] == "A, B"
+
+
+def test_keyed_by_provider() -> None:
+    clear_track_cache()
+    put_cached_track("deezer", "1", {"id": "1"})
+    assert get_cached_track("spotify", "1") is None
+
+
+def test_evicts_least_recently_used(monkeypatch) -> None:
+    clear_track_cache()
+    monkeypatch.setattr(track_cache, "TRACK_CACHE_MAXSIZE", 2)
+    put_cached_track("deezer", "1", {"id": "1"})
+    put_cached_track("deezer", "2", {"id": "2"})
+    get_cached_track("deezer", "1")
+    put_cached_track("deezer", "3", {"id": "3"})
+    assert get_cached_track("deezer", "2") is None
+    assert get_cached_track("deezer", "1") is not None
+
+
+def test_nested_values_are_not_shared() -> None:
+    clear_track_cache()
+    put_cached_track("spotify", "1", {"id": "1", "artists": ["A", "B"]})
+    get_cached_track("spotify", "1")["artists"].append("C")
+    assert get_cached_track("spotify", "1")["artists"] == ["A", "B"]
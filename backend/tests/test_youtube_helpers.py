@@ -80,3 +80,328 @@ def test_resolve_downloaded_audio_fallback_same_stem_different_ext(tmp_path) ->
         str(base), "flac", False, {}, ydl
     )
     assert out == str(mp3)
+
+
+def test_normalize_text_strips_meta_and_feat() -> None:
+    svc = YouTubeService()
+    assert svc.normalize_text("Song – Name  ft Someone") == "song name feat someone"
+    assert svc.tokens("  A   b\tc ") == ("a", "b", "c")
+
+
+def test_sanitize_filename() -> None:
+    assert YouTubeService().sanitize_filename(' a:b  "c"? ') == "ab c"
+
+
+def test_normalize_text_meta_tokens_are_whole_words() -> None:
+    svc = YouTubeService()
+    assert svc.normalize_text("Audiomachine - Shadow (Official Music Video)") == "audiomachine shadow ( )"
+    assert svc.normalize_text("Song HD Lyrics") == "song"
+
+
+def test_calculate_similarity_bounds() -> None:
+    svc = YouTubeService()
+    assert svc.calculate_similarity("Song", "song ") == 1.0
+    assert svc.calculate_similarity("", "abc") == 0.0
+    assert 0.0 < svc.calculate_similarity("song name", "song name live") < 1.0
+
+
+def test_title_score_containment_matches_full_ratio(monkeypatch) -> None:
+    svc = YouTubeService()
+    ratio = svc.calculate_similarity("song name", "artist song name live")
+    expected = max(0.55 * ratio + 0.45, 0.85)
+    monkeypatch.setattr(svc, "_similarity_prelower", lambda *_: pytest.fail("ratio not needed"))
+    assert svc.title_score("Song Name", "Artist - Song Name Live") == pytest.approx(expected)
+    assert svc.title_score("Song Name", "song name") == 1.0
+
+
+@pytest.mark.parametrize(
+    ("yt_sec", "expected"),
+    [(200, 1.0), (205, 1.0), (206, 0.85), (215, 0.85), (230, 0.65), (260, 0.35), (261, 0.0), (100, 0.0)],
+)
+def test_duration_score_steps(yt_sec, expected) -> None:
+    assert YouTubeService().duration_score(200_000, yt_sec) == expected
+
+
+def test_search_candidates_scores_and_sorts_ytmusic_results(monkeypatch) -> None:
+    from services import youtube
+
+    monkeypatch.setattr(youtube, "cache_get", lambda _key: None)
+    monkeypatch.setattr(youtube, "cache_set", lambda _key, _value: None)
+    svc = YouTubeService()
+    svc.ytmusic = MagicMock()
+    svc._ydl_search = MagicMock(return_value=[])
+    svc.ytmusic.search.return_value = [
+        {"videoId": "cover0000aa", "title": "Song (Cover)", "artists": [{"name": "Someone"}], "duration": "4:10"},
+        {"videoId": "orig00000aa", "title": "Song", "artists": [{"name": "Artist"}], "duration": "3:20"},
+    ]
+    result = svc.search_candidates("Song", "Artist", {"name": "Song", "artists": ["Artist"], "duration_ms": 200_000})
+    assert result["success"]
+    assert [c["video_id"] for c in result["candidates"]] == ["orig00000aa", "cover0000aa"]
+    assert result["best_score"] == result["candidates"][0]["score"] > result["candidates"][1]["score"]
+    # A confident YTMusic match never triggers the yt-dlp search
+    assert result["best_score"] >= youtube.CONFIDENCE_THRESHOLD
+    svc._ydl_search.assert_not_called()
+
+
+def test_ytm_search_results_are_cached(monkeypatch) -> None:
+    from services import youtube
+
+    store = {}
+    monkeypatch.setattr(youtube, "cache_get", store.get)
+    monkeypatch.setattr(youtube, "cache_set", store.__setitem__)
+    svc = YouTubeService()
+    svc.ytmusic = MagicMock()
+    svc.ytmusic.search.return_value = [{"videoId": "abc"}]
+    assert svc._ytm_search("artist song", 5) == [{"videoId": "abc"}]
+    assert svc._ytm_search("artist song", 5) == [{"videoId": "abc"}]
+    assert svc.ytmusic.search.call_count == 1
+
+
+def test_search_candidates_adds_ytdlp_results_when_ytmusic_is_weak(monkeypatch) -> None:
+    from services import youtube
+
+    monkeypatch.setattr(youtube, "cache_get", lambda _key: None)
+    monkeypatch.setattr(youtube, "cache_set", lambda _key, _value: None)
+    svc = YouTubeService()
+    svc.ytmusic = MagicMock()
+    svc.ytmusic.search.return_value = [
+        {"videoId": "other0000aa", "title": "Unrelated", "artists": [{"name": "X"}], "duration": "9:00"},
+    ]
+    svc._ydl_search = MagicMock(return_value=[
+        {"id": "other0000aa", "title": "Unrelated", "channel": "X", "duration": 540},
+        {"id": "match0000aa", "title": "Artist - Song", "channel": "Artist", "duration": 200},
+    ])
+    result = svc.search_candidates("Song", "Artist", {"name": "Song", "artists": ["Artist"], "duration_ms": 200_000})
+    ids = [c["video_id"] for c in result["candidates"]]
+    assert ids[0] == "match0000aa"
+    assert ids.count("other0000aa") == 1
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [("3:20", 200), (" 1:02:03 ", 3723), ("", None), ("200", None), ("1:2:3:4", None), ("a:10", None)],
+)
+def test_parse_duration_to_seconds(text, expected) -> None:
+    assert YouTubeService().parse_duration_to_seconds(text) == expected
+
+
+def test_score_candidates_matches_calculate_match_score() -> None:
+    svc = YouTubeService()
+    info = {"name": "Song (Live)", "artists": ["Artist", "Guest"], "duration_ms": 201_000}
+    candidate = {"title": "Artist - Song live ft Guest", "channel": "Artist", "source": "yt-dlp"}
+    svc._score_candidates([(2, 205, "", candidate)], "Song", "Artist", info)
+    expected = svc.calculate_match_score(
+        candidate["title"], candidate["channel"], "Song", "Artist",
+        track_info=info, rank=2, source="yt-dlp", yt_duration_seconds=205,
+    )
+    assert candidate["score"] == round(expected, 3)
+
+
+def test_heuristic_adjustment_live_cover_remix() -> None:
+    svc = YouTubeService()
+    assert svc.heuristic_adjustment("Song (Live)", "Song 现场") == pytest.approx(0.05)
+    assert svc.heuristic_adjustment("Song", "Song 翻唱 remix") == pytest.approx(-0.22)
+    assert svc.heuristic_adjustment("Song Cover", "Song cover") == 0.0
+
+
+def test_batched_similarities_match_per_pair_scores() -> None:
+    svc = YouTubeService()
+    info = {"name": "Song", "artists": ["Artist", "Other"], "duration_ms": 180_000}
+    candidates = [
+        {"title": "Song Remix", "channel": "", "source": "ytmusic"},
+        {"title": "Different Thing", "channel": "Artist Topic", "source": "ytmusic"},
+    ]
+    rows = [(i, 180, "", c) for i, c in enumerate(candidates, start=1)]
+    svc._score_candidates(rows, "Song", "Artist", info)
+    for rank, _sec, _s, c in rows:
+        expected = svc.calculate_match_score(
+            c["title"], c["channel"], "Song", "Artist", track_info=info, rank=rank, yt_duration_seconds=180
+        )
+        assert c["score"] == round(expected, 3)
+
+
+def test_pooled_ydl_reuses_instances_and_drops_failed(monkeypatch) -> None:
+    from services import youtube
+
+    created = []
+    monkeypatch.setattr(youtube.yt_dlp, "YoutubeDL", lambda opts: created.append(MagicMock()) or created[-1])
+    svc = YouTubeService()
+    with svc._pooled_ydl({"quiet": True}) as first:
+        pass
+    with svc._pooled_ydl({"quiet": True}) as second:
+        assert second is first
+    with pytest.raises(RuntimeError):
+        with svc._pooled_ydl({"quiet": True}):
+            raise RuntimeError("403")
+    first.close.assert_called_once()
+    with svc._pooled_ydl({"quiet": True}) as third:
+        assert third is not first
+    assert len(created) == 2
+
+
+def test_resolve_downloaded_audio_fallback_prefers_requested_ext(tmp_path) -> None:
+    base = tmp_path / "Artist - Song"
+    (tmp_path / "Artist - Song-1.webm").write_bytes(b"\x00")
+    (tmp_path / "Artist - Song-1.flac").write_bytes(b"\x00")
+    (tmp_path / "Other.flac").write_bytes(b"\x00")
+    ydl = MagicMock()
+    ydl.prepare_filename.side_effect = Exception("no")
+    out = YouTubeService()._resolve_downloaded_audio(str(base), "flac", False, {}, ydl)
+    assert out == str(tmp_path / "Artist - Song-1.flac")
+
+
+def test_title_score_counts_substring_tokens_for_unspaced_titles() -> None:
+    svc = YouTubeService()
+    assert svc.title_score("告白 气球", "周杰伦告白气球") > svc.title_score("告白 气球", "周杰伦晴天")
+
+
+def test_pooled_ydl_shares_download_instance_across_outtmpls(monkeypatch) -> None:
+    from services import youtube
+
+    created = []
+
+    def fake_ydl(opts):
+        ydl = MagicMock()
+        ydl.params = {"outtmpl": {"default": "%(title)s.%(ext)s"}}
+        created.append(ydl)
+        return ydl
+
+    monkeypatch.setattr(youtube.yt_dlp, "YoutubeDL", fake_ydl)
+    svc = YouTubeService()
+    with svc._pooled_ydl({"format": "bestaudio"}, outtmpl="/dl/A - One.%(ext)s") as first:
+        assert first.params["outtmpl"]["default"] == "/dl/A - One.%(ext)s"
+    with svc._pooled_ydl({"format": "bestaudio"}, outtmpl="/dl/A - Two.%(ext)s") as second:
+        assert second is first
+        assert second.params["outtmpl"]["default"] == "/dl/A - Two.%(ext)s"
+    assert len(created) == 1
+
+
+def test_search_and_download_falls_back_to_top_flat_hit_by_id(monkeypatch) -> None:
+    svc = YouTubeService()
+    monkeypatch.setattr(
+        svc,
+        "search_candidates",
+        lambda *a, **k: {"success": True, "candidates": [{"title": "x", "score": 0.1, "video_id": "weak"}]},
+    )
+    queries = []
+    monkeypatch.setattr(
+        svc,
+        "_ydl_search",
+        lambda q, n: queries.append((q, n)) or [None, {"id": "top1", "title": "Song", "channel": "Artist"}],
+    )
+    downloads = []
+    monkeypatch.setattr(
+        svc,
+        "download_by_video_id",
+        lambda vid, *a: downloads.append(vid) or {"success": True, "file_path": "/tmp/x.mp3"},
+    )
+    out = svc.search_and_download("Song", "Artist", "/tmp/x.mp3", {"album": "LP"})
+    assert out["success"]
+    assert downloads == ["top1"]
+    assert queries == [("Artist Song LP official", 3)]
+
+
+@pytest.mark.parametrize(
+    "fmt, copies_opus, has_filter_args",
+    [("opus", True, False), ("mp3", False, True), ("flac", False, False)],
+)
+def test_download_opts_remux_opus_without_filters(monkeypatch, tmp_path, fmt, copies_opus, has_filter_args) -> None:
+    from services import youtube
+
+    seen = []
+
+    def fake_ydl(opts):
+        seen.append(opts)
+        ydl = MagicMock()
+        ydl.params = {"outtmpl": {}}
+        ydl.extract_info.side_effect = RuntimeError("offline")
+        return ydl
+
+    monkeypatch.setattr(youtube.yt_dlp, "YoutubeDL", fake_ydl)
+    out = YouTubeService().download_by_video_id("abc", str(tmp_path / f"x.{fmt}"), fmt)
+    assert not out["success"]
+    assert seen[0]["format"].startswith("bestaudio[acodec=opus]") is copies_opus
+    assert ("postprocessor_args" in seen[0]) is has_filter_args
+
+
+def test_warm_up_leaves_search_instances_for_first_search(monkeypatch) -> None:
+    from services import youtube
+
+    created = []
+
+    def fake_ydl(opts):
+        ydl = MagicMock()
+        ydl.extract_info.return_value = {"entries": [{"id": "a", "title": "T"}]}
+        created.append(ydl)
+        return ydl
+
+    monkeypatch.setattr(youtube.yt_dlp, "YoutubeDL", fake_ydl)
+    monkeypatch.setattr(youtube, "cache_get", lambda key: None)
+    monkeypatch.setattr(youtube, "cache_set", lambda key, value, ttl_sec=None: None)
+    svc = YouTubeService()
+    svc.warm_up()
+    assert len(created) == 2
+    svc._ydl_search("Artist Song official audio", 5)
+    assert len(created) == 2
+
+
+def _write_flac_header(path, total_samples: int) -> None:
+    # fLaC marker + a last-block STREAMINFO (44.1 kHz, 2ch, 16 bit); mutagen derives length from it
+    streaminfo = bytes(10) + bytes([0x0A, 0xC4, 0x40, 0xF0]) + total_samples.to_bytes(4, "big") + bytes(16)
+    path.write_bytes(b"fLaC" + bytes([0x80, 0, 0, 34]) + streaminfo)
+
+
+def _failing_ydl_factory(built, write_partial=None):
+    def fake_ydl(opts):
+        built.append(opts)
+        ydl = MagicMock()
+        ydl.params = {"outtmpl": {}}
+
+        def extract_info(*_a, **_k):
+            if write_partial is not None:
+                write_partial.write_bytes(b"\xff\xfb" + bytes(64))
+            raise RuntimeError("ffmpeg exited with code 1")
+
+        ydl.extract_info.side_effect = extract_info
+        return ydl
+
+    return fake_ydl
+
+
+def test_download_by_video_id_reuses_existing_file_unless_overwrite(monkeypatch, tmp_path) -> None:
+    from services import youtube
+
+    target = tmp_path / "Artist - Song.flac"
+    _write_flac_header(target, 44100)
+    built = []
+    monkeypatch.setattr(youtube.yt_dlp, "YoutubeDL", _failing_ydl_factory(built))
+    svc = YouTubeService()
+    out = svc.download_by_video_id("abc", str(target), "flac")
+    assert out["success"] and out["file_path"] == str(target)
+    assert built == []
+    assert not svc.download_by_video_id("abc", str(target), "flac", overwrite=True)["success"]
+    assert len(built) == 1
+    # The failed attempt did not touch the file, so it is kept
+    assert target.exists()
+
+
+def test_download_by_video_id_does_not_reuse_unparseable_file(monkeypatch, tmp_path) -> None:
+    from services import youtube
+
+    target = tmp_path / "Artist - Song.mp3"
+    target.write_bytes(b"ID3")
+    built = []
+    monkeypatch.setattr(youtube.yt_dlp, "YoutubeDL", _failing_ydl_factory(built))
+    assert not YouTubeService().download_by_video_id("abc", str(target), "mp3")["success"]
+    assert len(built) == 1
+
+
+def test_failed_download_removes_partial_output(monkeypatch, tmp_path) -> None:
+    from services import youtube
+
+    target = tmp_path / "Artist - Song.mp3"
+    built = []
+    monkeypatch.setattr(youtube.yt_dlp, "YoutubeDL", _failing_ydl_factory(built, write_partial=target))
+    svc = YouTubeService()
+    assert not svc.download_by_video_id("abc", str(target), "mp3")["success"]
+    assert not target.exists()
@@ -0,0 +1,51 @@
+"""Tests for the YouTube metadata TTL cache."""
+
+from __future__ import annotations
+
+import pytest
+
+import config
+from utils import yt_cache
+from utils.job_store import init_jobs_db
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache() -> None:
+    init_jobs_db()
+    yt_cache.cache_clear()
+
+
+def test_set_then_get() -> None:
+    key = yt_cache.make_key("info", "https://youtu.be/abc")
+    yt_cache.cache_set(key, {"success": True, "title": "x"})
+    assert yt_cache.cache_get(key) == {"success": True, "title": "x"}
+
+
+def test_survives_memory_clear_via_db() -> None:
+    key = yt_cache.make_key("info", "persisted")
+    yt_cache.cache_set(key, {"success": True})
+    yt_cache._memory.clear()
+    assert yt_cache.cache_get(key) == {"success": True}
+
+
+def test_expired_entries_are_ignored(monkeypatch) -> None:
+    key = yt_cache.make_key("info", "old")
+    yt_cache.cache_set(key, {"success": True})
+    now = yt_cache.time.time()
+    monkeypatch.setattr(yt_cache.time, "time", lambda: now + config.YOUTUBE_METADATA_CACHE_TTL_SEC + 1)
+    assert yt_cache.cache_get(key) is None
+
+
+def test_clear() -> None:
+    key = yt_cache.make_key("candidates", "a", "b")
+    yt_cache.cache_set(key, {"success": True})
+    assert yt_cache.cache_clear() == 1
+    assert yt_cache.cache_get(key) is None
+
+
+def test_per_entry_ttl_outlives_default(monkeypatch) -> None:
+    key = yt_cache.make_key("info", "long-lived")
+    yt_cache.cache_set(key, {"success": True}, ttl_sec=config.YOUTUBE_METADATA_CACHE_TTL_SEC * 10)
+    now = yt_cache.time.time()
+    monkeypatch.setattr(yt_cache.time, "time", lambda: now + config.YOUTUBE_METADATA_CACHE_TTL_SEC + 1)
+    assert yt_cache.cache_get(key) == {"success": True}
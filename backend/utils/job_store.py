@@ -1,35 +1,116 @@
+import atexit
+import logging
 import os
+import queue
 import sqlite3
-import json
+import threading
 import time
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import orjson
 
 import config
 
+logger = logging.getLogger(__name__)
+
 JOBS_DB_PATH = os.path.join(config.DOWNLOAD_DIR, "jobs.db")
 
+# Bump when init_jobs_db gains a one-time migration for databases from older versions
+SCHEMA_VERSION = 1
+
+# WAL allows a single writer alongside any number of readers: one shared write
+# connection (serialized by a lock) plus a small pool of read-only connections.
+READ_POOL_SIZE = max(2, min(os.cpu_count() or 2, 8))
+# Readers map the DB file instead of copying pages through read(); an upper bound, not a reservation
+READ_MMAP_SIZE = 256 * 1024 * 1024
+
+_write_lock = threading.Lock()
+_write_conn: Optional[sqlite3.Connection] = None
+_read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+_read_pool_lock = threading.Lock()
+_read_pool_created = 0
+
 
 def _now_ms() -> int:
-    return int(time.time() * 1000)
+    return time.time_ns() // 1_000_000
 
 
-def _db() -> sqlite3.Connection:
-    conn = sqlite3.connect(JOBS_DB_PATH, timeout=5, check_same_thread=False)
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    # Runs once per pooled connection. busy_timeout comes from connect(timeout=5), and
+    # journal_mode=WAL is persistent in the file (set once on the write connection).
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA busy_timeout=5000;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA cache_size=-20000;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
     return conn
 
 
+@contextmanager
+def get_write_conn() -> Iterator[sqlite3.Connection]:
+    """The single write connection, held exclusively inside a BEGIN IMMEDIATE transaction."""
+    global _write_conn
+    with _write_lock:
+        if _write_conn is None:
+            # isolation_level=None: we issue BEGIN IMMEDIATE ourselves to take the write lock up front
+            conn = sqlite3.connect(
+                JOBS_DB_PATH, timeout=5, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL;")
+            _write_conn = _configure(conn)
+        conn = _write_conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+        except BaseException:
+            # SQLite may already have rolled back (e.g. SQLITE_FULL); a bare ROLLBACK
+            # would then raise and mask the original error
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+@contextmanager
+def get_read_conn() -> Iterator[sqlite3.Connection]:
+    """Borrow a read-only connection from the pool (reads run in parallel with the writer)."""
+    global _read_pool_created
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        with _read_pool_lock:
+            can_create = _read_pool_created < READ_POOL_SIZE
+            if can_create:
+                _read_pool_created += 1
+        if can_create:
+            try:
+                conn = _configure(sqlite3.connect(
+                    f"file:{JOBS_DB_PATH}?mode=ro", uri=True, timeout=5, check_same_thread=False
+                ))
+                conn.execute(f"PRAGMA mmap_size={READ_MMAP_SIZE};")
+            except Exception:
+                with _read_pool_lock:
+                    _read_pool_created -= 1
+                raise
+        else:
+            conn = _read_pool.get()
+    try:
+        yield conn
+    finally:
+        _read_pool.put(conn)
+
+
 def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl_sql: str) -> None:
-    cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
-    if column not in cols:
+    exists = conn.execute(
+        "SELECT 1 FROM pragma_table_info(?) WHERE name = ?", (table, column)
+    ).fetchone()
+    if not exists:
         conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl_sql}")
 
 
 def init_jobs_db() -> None:
-    conn = _db()
-    try:
+    with get_write_conn() as conn:
         conn.execute("""
         CREATE TABLE IF NOT EXISTS download_jobs (
             job_id TEXT PRIMARY KEY,
@@ -47,12 +128,25 @@ def init_jobs_db() -> None:
         )
         """)
 
-        # If the table existed before album_id was added, migrate in-place.
-        _ensure_column(conn, "download_jobs", "album_id", "TEXT")
+        # Databases created before album_id / the album index existed are migrated once;
+        # user_version records that, so later startups skip the schema probe.
+        migrate = conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION
+        if migrate:
+            _ensure_column(conn, "download_jobs", "album_id", "TEXT")
 
         conn.execute("CREATE INDEX IF NOT EXISTS idx_download_jobs_status ON download_jobs(status)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_download_jobs_updated ON download_jobs(updated_at_ms)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_download_jobs_album_id ON download_jobs(album_id)")
+        # Album polls filter by album_id and order by recency; with status and job_id in the
+        # index the aggregate is answered from the index alone and no query needs a sort step.
+        # It supersedes the older (album_id) and (album_id, status) indexes.
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_download_jobs_album_updated "
+            "ON download_jobs(album_id, updated_at_ms DESC, status, job_id)"
+        )
+        if migrate:
+            conn.execute("DROP INDEX IF EXISTS idx_download_jobs_album_id")
+            conn.execute("DROP INDEX IF EXISTS idx_download_jobs_album_status")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
         conn.execute("""
         CREATE TABLE IF NOT EXISTS completed_track_downloads (
@@ -62,9 +156,16 @@ def init_jobs_db() -> None:
             PRIMARY KEY (track_id, provider)
         )
         """)
-        conn.commit()
-    finally:
-        conn.close()
+
+        # YouTube metadata cache (see utils.yt_cache); expired rows are dropped on startup.
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS yt_metadata (
+            key TEXT PRIMARY KEY,
+            payload_json TEXT NOT NULL,
+            expires_at_ms INTEGER NOT NULL
+        )
+        """)
+        conn.execute("DELETE FROM yt_metadata WHERE expires_at_ms <= ?", (_now_ms(),))
 
 
 def reset_stale_inflight_jobs() -> int:
@@ -74,8 +175,7 @@ def reset_stale_inflight_jobs() -> int:
     """
     now = _now_ms()
     msg = "Interrupted — server restarted. Retry the download."
-    conn = _db()
-    try:
+    with get_write_conn() as conn:
         cur = conn.execute(
             """
             UPDATE download_jobs
@@ -89,10 +189,60 @@ def reset_stale_inflight_jobs() -> int:
             (msg, now),
         )
         n = cur.rowcount or 0
-        conn.commit()
         return n
-    finally:
-        conn.close()
+
+
+_UPSERT_JOB_SQL = """
+INSERT INTO download_jobs (
+    job_id, status, stage, progress, message, file_path, download_url, error,
+    album_id, payload_json, created_at_ms, updated_at_ms
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(job_id) DO UPDATE SET
+    status=excluded.status,
+    stage=COALESCE(excluded.stage, download_jobs.stage),
+    progress=COALESCE(excluded.progress, download_jobs.progress),
+    message=excluded.message,
+    file_path=COALESCE(excluded.file_path, download_jobs.file_path),
+    download_url=COALESCE(excluded.download_url, download_jobs.download_url),
+    error=COALESCE(excluded.error, download_jobs.error),
+    album_id=COALESCE(excluded.album_id, download_jobs.album_id),
+    payload_json=COALESCE(excluded.payload_json, download_jobs.payload_json),
+    updated_at_ms=excluded.updated_at_ms
+"""
+
+# Progress updates are buffered per job and written in one batch every FLUSH interval.
+DEBOUNCE_FLUSH_INTERVAL_SEC = 0.1
+
+_pending_lock = threading.Lock()
+_pending_jobs: Dict[str, Dict[str, Any]] = {}
+_flusher_started = False
+
+
+def _job_row(job_id: str, fields: Dict[str, Any], now: int) -> tuple:
+    payload = fields.get("payload")
+    return (
+        job_id,
+        fields["status"],
+        fields.get("stage"),
+        fields.get("progress"),
+        fields["message"],
+        fields.get("file_path"),
+        fields.get("download_url"),
+        fields.get("error"),
+        fields.get("album_id"),
+        orjson.dumps(payload).decode("utf-8") if payload is not None else None,
+        now,
+        now,
+    )
+
+
+def _merge_fields(older: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+    """Same semantics as the upsert: status/message always replace, other fields only when set."""
+    merged = dict(older)
+    for k, v in newer.items():
+        if v is not None or k in ("status", "message"):
+            merged[k] = v
+    return merged
 
 
 def upsert_job(
@@ -108,41 +258,99 @@ def upsert_job(
     album_id: Optional[str] = None,
     payload: Optional[Dict[str, Any]] = None,
 ) -> None:
+    fields = {
+        "status": status,
+        "message": message,
+        "stage": stage,
+        "progress": progress,
+        "file_path": file_path,
+        "download_url": download_url,
+        "error": error,
+        "album_id": album_id,
+        "payload": payload,
+    }
+    # Holding _pending_lock keeps a buffered (older) update from landing after this one.
+    with _pending_lock:
+        pending = _pending_jobs.pop(job_id, None)
+        if pending is not None:
+            fields = _merge_fields(pending, fields)
+        with get_write_conn() as conn:
+            conn.execute(_UPSERT_JOB_SQL, _job_row(job_id, fields, _now_ms()))
+
+
+def upsert_jobs_many(jobs: List[Tuple[str, Dict[str, Any]]]) -> None:
+    """upsert_job for many jobs in one write transaction (e.g. queuing a whole album).
+
+    Each item is (job_id, fields) where fields are upsert_job's keyword arguments.
+    """
+    if not jobs:
+        return
     now = _now_ms()
-    conn = _db()
-    try:
-        conn.execute("""
-        INSERT INTO download_jobs (
-            job_id, status, stage, progress, message, file_path, download_url, error,
-            album_id, payload_json, created_at_ms, updated_at_ms
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(job_id) DO UPDATE SET
-            status=excluded.status,
-            stage=COALESCE(excluded.stage, download_jobs.stage),
-            progress=COALESCE(excluded.progress, download_jobs.progress),
-            message=excluded.message,
-            file_path=COALESCE(excluded.file_path, download_jobs.file_path),
-            download_url=COALESCE(excluded.download_url, download_jobs.download_url),
-            error=COALESCE(excluded.error, download_jobs.error),
-            album_id=COALESCE(excluded.album_id, download_jobs.album_id),
-            payload_json=COALESCE(excluded.payload_json, download_jobs.payload_json),
-            updated_at_ms=excluded.updated_at_ms
-        """, (
-            job_id, status, stage, progress, message, file_path, download_url, error,
-            album_id,
-            json.dumps(payload) if payload is not None else None,
-            now, now
-        ))
-        conn.commit()
-    finally:
-        conn.close()
+    with _pending_lock:
+        rows = []
+        for job_id, fields in jobs:
+            pending = _pending_jobs.pop(job_id, None)
+            if pending is not None:
+                fields = _merge_fields(pending, fields)
+            rows.append(_job_row(job_id, fields, now))
+        with get_write_conn() as conn:
+            conn.executemany(_UPSERT_JOB_SQL, rows)
+
+
+def upsert_job_debounced(job_id: str, **fields: Any) -> None:
+    """Buffer an intermediate progress update; written by the flusher thread within ~100 ms.
+
+    Use upsert_job for terminal states (completed/error) — it writes immediately and
+    absorbs any update still buffered for the job.
+    """
+    if fields.get("status") in ("completed", "error"):
+        upsert_job(job_id, **fields)
+        return
+    with _pending_lock:
+        pending = _pending_jobs.get(job_id)
+        _pending_jobs[job_id] = _merge_fields(pending, fields) if pending else dict(fields)
+    _ensure_flusher()
+
+
+def flush_pending_jobs() -> int:
+    """Write all buffered job updates in one transaction. Returns the number of jobs written."""
+    with _pending_lock:
+        if not _pending_jobs:
+            return 0
+        now = _now_ms()
+        rows = [_job_row(job_id, f, now) for job_id, f in _pending_jobs.items()]
+        with get_write_conn() as conn:
+            conn.executemany(_UPSERT_JOB_SQL, rows)
+        # Only drop the buffer once the transaction committed; a failed write is retried next tick
+        _pending_jobs.clear()
+        return len(rows)
+
+
+def _ensure_flusher() -> None:
+    global _flusher_started
+    if _flusher_started:
+        return
+    with _pending_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+
+    def runner() -> None:
+        while True:
+            time.sleep(DEBOUNCE_FLUSH_INTERVAL_SEC)
+            try:
+                flush_pending_jobs()
+            except Exception:
+                logger.exception("Job store flush failed")
+
+    threading.Thread(target=runner, daemon=True, name="job-store-flush").start()
+    atexit.register(flush_pending_jobs)
 
 
 def record_completed_download(track_id: str, provider: str) -> None:
     """Mark a catalog track as already downloaded (survives temp file cleanup)."""
     now = _now_ms()
-    conn = _db()
-    try:
+    with get_write_conn() as conn:
         conn.execute(
             """
             INSERT INTO completed_track_downloads (track_id, provider, completed_at_ms)
@@ -151,98 +359,116 @@ def record_completed_download(track_id: str, provider: str) -> None:
             """,
             (track_id, provider, now),
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
 def has_completed_download(track_id: str, provider: str) -> bool:
-    conn = _db()
-    try:
+    with get_read_conn() as conn:
         row = conn.execute(
             "SELECT 1 FROM completed_track_downloads WHERE track_id = ? AND provider = ?",
             (track_id, provider),
         ).fetchone()
         return row is not None
-    finally:
-        conn.close()
 
 
-def get_job(job_id: str) -> Optional[Dict[str, Any]]:
-    conn = _db()
-    try:
+_JOB_COLS = (
+    "job_id", "status", "stage", "progress", "message", "file_path", "download_url", "error",
+    "album_id", "created_at_ms", "updated_at_ms",
+)
+_GET_JOB_SQL = f"SELECT {', '.join(_JOB_COLS)} FROM download_jobs WHERE job_id = ?"
+_GET_JOB_WITH_PAYLOAD_SQL = f"SELECT {', '.join(_JOB_COLS)}, payload_json FROM download_jobs WHERE job_id = ?"
+
+
+def get_job(job_id: str, *, with_payload: bool = False) -> Optional[Dict[str, Any]]:
+    """Job row as a dict; 'payload' (decoded payload_json) is only read when with_payload."""
+    with get_read_conn() as conn:
         row = conn.execute(
-            "SELECT * FROM download_jobs WHERE job_id = ?",
+            _GET_JOB_WITH_PAYLOAD_SQL if with_payload else _GET_JOB_SQL,
             (job_id,),
         ).fetchone()
         if not row:
             return None
 
-        d = dict(row)
-        payload_json = d.pop("payload_json", None)
-        if payload_json:
+        d = dict(zip(_JOB_COLS, row))
+        if with_payload:
+            payload_json = row[len(_JOB_COLS)]
             try:
-                d["payload"] = json.loads(payload_json)
+                d["payload"] = orjson.loads(payload_json) if payload_json else None
             except Exception:
                 d["payload"] = None
-        else:
-            d["payload"] = None
 
         return d
-    finally:
-        conn.close()
 
-def get_album_track_jobs(album_id: str, *, exclude_job_id: Optional[str] = None) -> list[dict]:
-    conn = _db()
-    try:
-        sql = """
-        SELECT job_id, status, stage, progress, message, file_path, download_url, error, updated_at_ms
+
+class JobSummary(NamedTuple):
+    """One album track job, in _ALBUM_TRACK_JOBS_SQL column order (use ._asdict() for a dict)."""
+
+    job_id: str
+    status: str
+    stage: Optional[str]
+    progress: Optional[int]
+    message: Optional[str]
+    file_path: Optional[str]
+    download_url: Optional[str]
+    error: Optional[str]
+    updated_at_ms: int
+
+
+_ALBUM_TRACK_JOBS_SQL = """
+SELECT job_id, status, stage, progress, message, file_path, download_url, error, updated_at_ms
+FROM download_jobs
+WHERE album_id = ?
+ORDER BY updated_at_ms DESC
+"""
+
+_ALBUM_TRACK_JOBS_EXCLUDING_SQL = """
+SELECT job_id, status, stage, progress, message, file_path, download_url, error, updated_at_ms
+FROM download_jobs
+WHERE album_id = ? AND job_id <> ?
+ORDER BY updated_at_ms DESC
+"""
+
+_ALBUM_AGGREGATE_SQL = """
+SELECT
+    COUNT(*) AS total,
+    COALESCE(SUM(status = 'completed'), 0) AS completed,
+    COALESCE(SUM(status = 'error'), 0) AS failed,
+    (
+        SELECT job_id
         FROM download_jobs
-        WHERE album_id = ?
-        """
-        params = [album_id]
+        WHERE album_id = :album_id AND job_id <> :exclude
+          AND status NOT IN ('completed', 'error')
+        ORDER BY updated_at_ms DESC
+        LIMIT 1
+    ) AS current_track
+FROM download_jobs
+WHERE album_id = :album_id AND job_id <> :exclude
+"""
+
+
+def get_album_track_jobs(album_id: str, *, exclude_job_id: Optional[str] = None) -> List[JobSummary]:
+    # Fixed SQL strings so sqlite3's per-connection statement cache reuses the prepared statement
+    with get_read_conn() as conn:
+        cur = conn.cursor()
+        # Plain tuples map straight onto JobSummary; no per-row sqlite3.Row or dict
+        cur.row_factory = None
         if exclude_job_id:
-            sql += " AND job_id <> ?"
-            params.append(exclude_job_id)
-
-        sql += " ORDER BY updated_at_ms DESC"
-        rows = conn.execute(sql, params).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+            cur.execute(_ALBUM_TRACK_JOBS_EXCLUDING_SQL, (album_id, exclude_job_id))
+        else:
+            cur.execute(_ALBUM_TRACK_JOBS_SQL, (album_id,))
+        return list(map(JobSummary._make, cur.fetchall()))
 
 
 def get_album_aggregate(album_id: str, *, exclude_job_id: Optional[str] = None) -> dict:
-    conn = _db()
-    try:
-        where = "album_id = ?"
-        params: list = [album_id]
-        if exclude_job_id:
-            where += " AND job_id <> ?"
-            params.append(exclude_job_id)
-
-        total = conn.execute(f"SELECT COUNT(*) AS n FROM download_jobs WHERE {where}", params).fetchone()["n"]
-        completed = conn.execute(
-            f"SELECT COUNT(*) AS n FROM download_jobs WHERE {where} AND status = 'completed'",
-            params,
-        ).fetchone()["n"]
-        failed = conn.execute(
-            f"SELECT COUNT(*) AS n FROM download_jobs WHERE {where} AND status = 'error'",
-            params,
-        ).fetchone()["n"]
-
-        current = conn.execute(
-            f"""
-            SELECT job_id
-            FROM download_jobs
-            WHERE {where} AND status NOT IN ('completed', 'error')
-            ORDER BY updated_at_ms DESC
-            LIMIT 1
-            """,
-            params,
+    # One covering-index pass (idx_download_jobs_album_updated); polled every few seconds by the UI.
+    with get_read_conn() as conn:
+        row = conn.execute(
+            _ALBUM_AGGREGATE_SQL,
+            {"album_id": album_id, "exclude": exclude_job_id or ""},
         ).fetchone()
-        current_track = current["job_id"] if current else None
 
+        total = row["total"]
+        completed = row["completed"]
+        failed = row["failed"]
         status = "completed" if total > 0 and (completed + failed) >= total else "downloading"
 
         return {
@@ -250,7 +476,5 @@ def get_album_aggregate(album_id: str, *, exclude_job_id: Optional[str] = None)
             "total_tracks": total,
             "completed_tracks": completed,
             "failed_tracks": failed,
-            "current_track": current_track,
+            "current_track": row["current_track"],
         }
-    finally:
-        conn.close()
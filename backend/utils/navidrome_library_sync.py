@@ -18,10 +18,13 @@ AUDIO_EXTENSIONS = frozenset(
 )
 
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
 def _norm(s: str) -> str:
     if not s:
         return ""
-    return re.sub(r"[^a-z0-9]+", "", s.lower())
+    return _NON_ALNUM_RE.sub("", s.lower())
 
 
 def _first_tag_value(audio: Any, keys: Tuple[str, ...]) -> Optional[str]:
@@ -0,0 +1,46 @@
+"""
+In-memory LRU cache of catalog track details, keyed by (provider, track_id).
+
+Catalog track metadata does not change between requests. Album downloads prime it
+through a provider batch lookup (Spotify GET /v1/tracks) where one exists; other
+tracks are cached on their first get_track_details call. Entries are kept as orjson
+bytes: compact, and every read decodes a fully independent dict.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+TRACK_CACHE_MAXSIZE = 4096
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+
+def get_cached_track(provider: str, track_id: str) -> Optional[Dict[str, Any]]:
+    """Return a fresh copy of the cached track dict (callers mutate artist strings in place)."""
+    key = (provider, str(track_id))
+    with _lock:
+        raw = _cache.get(key)
+        if raw is None:
+            return None
+        _cache.move_to_end(key)
+    return orjson.loads(raw)
+
+
+def put_cached_track(provider: str, track_id: str, track_info: Dict[str, Any]) -> None:
+    key = (provider, str(track_id))
+    raw = orjson.dumps(track_info)
+    with _lock:
+        _cache[key] = raw
+        _cache.move_to_end(key)
+        while len(_cache) > TRACK_CACHE_MAXSIZE:
+            _cache.popitem(last=False)
+
+
+def clear_track_cache() -> None:
+    with _lock:
+        _cache.clear()
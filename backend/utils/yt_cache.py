@@ -0,0 +1,104 @@
+"""
+TTL cache for YouTube metadata lookups (video info, candidate searches).
+
+Entries live in memory and are written through to the yt_metadata table in the
+jobs DB, so a restart does not throw away lookups the UI is likely to repeat.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+import config
+from utils.job_store import get_read_conn, get_write_conn
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def make_key(kind: str, *parts: Any) -> str:
+    raw = orjson.dumps([kind, *parts], default=str, option=orjson.OPT_SORT_KEYS)
+    return f"{kind}:{hashlib.blake2b(raw, digest_size=16).hexdigest()}"
+
+
+def _enabled() -> bool:
+    return config.YOUTUBE_METADATA_CACHE_TTL_SEC > 0
+
+
+def cache_get(key: str) -> Optional[Dict[str, Any]]:
+    if not _enabled():
+        return None
+    now = time.time()
+    with _lock:
+        hit = _memory.get(key)
+        if hit is not None:
+            expires_at, value = hit
+            if expires_at > now:
+                _memory.move_to_end(key)
+                return value
+            del _memory[key]
+
+    try:
+        with get_read_conn() as conn:
+            row = conn.execute(
+                "SELECT payload_json, expires_at_ms FROM yt_metadata WHERE key = ? AND expires_at_ms > ?",
+                (key, int(now * 1000)),
+            ).fetchone()
+    except Exception:
+        row = None
+    if row is None:
+        return None
+    try:
+        value = orjson.loads(row["payload_json"])
+    except Exception:
+        return None
+    _memory_put(key, value, row["expires_at_ms"] / 1000.0)
+    return value
+
+
+def _memory_put(key: str, value: Dict[str, Any], expires_at: float) -> None:
+    with _lock:
+        _memory[key] = (expires_at, value)
+        _memory.move_to_end(key)
+        while len(_memory) > max(1, config.YOUTUBE_METADATA_CACHE_MAXSIZE):
+            _memory.popitem(last=False)
+
+
+def cache_set(key: str, value: Dict[str, Any], ttl_sec: Optional[int] = None) -> None:
+    """Store value for ttl_sec seconds (default YOUTUBE_METADATA_CACHE_TTL_SEC)."""
+    if not _enabled():
+        return
+    if ttl_sec is None:
+        ttl_sec = config.YOUTUBE_METADATA_CACHE_TTL_SEC
+    expires_at = time.time() + ttl_sec
+    _memory_put(key, value, expires_at)
+    try:
+        with get_write_conn() as conn:
+            conn.execute(
+                """
+                INSERT INTO yt_metadata (key, payload_json, expires_at_ms) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    payload_json = excluded.payload_json,
+                    expires_at_ms = excluded.expires_at_ms
+                """,
+                (key, orjson.dumps(value).decode("utf-8"), int(expires_at * 1000)),
+            )
+    except Exception as e:
+        print(f"YouTube metadata cache write failed: {e}")
+
+
+def cache_clear() -> int:
+    """Drop all cached entries (memory and DB). Returns the number of DB rows removed."""
+    with _lock:
+        _memory.clear()
+    try:
+        with get_write_conn() as conn:
+            return conn.execute("DELETE FROM yt_metadata").rowcount or 0
+    except Exception as e:
+        print(f"YouTube metadata cache clear failed: {e}")
+        return 0
@@ -30,13 +30,24 @@ import os
 import re
 import sys
 from dataclasses import dataclass
-from difflib import SequenceMatcher
 from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 from ytmusicapi import YTMusic
 
+# Same scorer as the backend (normalized Indel similarity == Levenshtein.ratio); difflib
+# is a slower, slightly different stand-in when rapidfuzz isn't installed
+try:
+    from rapidfuzz.distance import Indel
+
+    _ratio = Indel.normalized_similarity
+except ImportError:
+    from difflib import SequenceMatcher
+
+    def _ratio(a: str, b: str) -> float:
+        return SequenceMatcher(None, a, b).ratio()
+
 
 # Best-effort: force UTF-8 output (Windows consoles often default to cp1252)
 try:
@@ -52,7 +63,7 @@ CONFIDENCE_THRESHOLD = 0.65
 def calculate_similarity(str1: str, str2: str) -> float:
     str1 = (str1 or "").lower().strip()
     str2 = (str2 or "").lower().strip()
-    return SequenceMatcher(None, str1, str2).ratio()
+    return _ratio(str1, str2)
 
 
 def normalize_text(s: str) -> str: